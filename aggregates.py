@@ -0,0 +1,139 @@
+from sqlalchemy import select, func, extract, literal, null, union_all, Integer, String
+from models import db, Category, SpendRollup
+from archive import purchase_source
+
+def spend_source(purchase_filter):
+    # Free-text search can only be answered from the purchases themselves,
+    # and like the export it has to reach into the archive for ranges that
+    # go back that far, since rollups count archived purchases too. Every
+    # other filter maps onto a rollup column, so the scan stays on the much
+    # smaller rollup table whenever possible.
+    if purchase_filter.search:
+        return purchase_source(purchase_filter.date_from)
+    return SpendRollup
+
+def _filtered_spend(purchase_filter, source):
+    # Either way `total` is in integer minor units, so the sums below are
+    # exact.
+    if source is not SpendRollup:
+        stmt = select(
+            source.category_id,
+            source.vendor,
+            source.purchase_type,
+            source.date_collected.label('day'),
+            (source.amount_minor * source.quantity).label('total'),
+            literal(1).label('purchase_count')
+        ).where(*purchase_filter.conditions(source))
+    else:
+        stmt = select(
+            SpendRollup.category_id,
+            SpendRollup.vendor,
+            SpendRollup.purchase_type,
+            SpendRollup.day,
+            SpendRollup.total_minor.label('total'),
+            SpendRollup.purchase_count
+        ).where(*purchase_filter.conditions(SpendRollup, SpendRollup.day))
+    
+    return stmt.cte('filtered_spend').prefix_with('MATERIALIZED')
+
+def summary_statement(purchase_filter, source=SpendRollup):
+    spend = _filtered_spend(purchase_filter, source)
+    total = func.sum(spend.c.total)
+    count = func.sum(spend.c.purchase_count)
+    no_label = null().cast(String)
+    no_period = null().cast(Integer)
+    
+    overall = select(
+        literal('total').label('dimension'), no_label.label('label'),
+        no_period.label('year'), no_period.label('month'),
+        total.label('total'), count.label('purchase_count')
+    )
+    
+    by_category = select(
+        literal('category'), Category.name, no_period, no_period, total, count
+    ).select_from(
+        spend.join(Category, spend.c.category_id == Category.id)
+    ).group_by(Category.name)
+    
+    top_vendors = select(
+        spend.c.vendor, total.label('total'), count.label('purchase_count')
+    ).group_by(spend.c.vendor).order_by(total.desc()).limit(10).subquery()
+    by_vendor = select(
+        literal('vendor'), top_vendors.c.vendor, no_period, no_period,
+        top_vendors.c.total, top_vendors.c.purchase_count
+    )
+    
+    by_type = select(
+        literal('type'), spend.c.purchase_type, no_period, no_period, total, count
+    ).group_by(spend.c.purchase_type)
+    
+    year = extract('year', spend.c.day)
+    month = extract('month', spend.c.day)
+    by_month = select(
+        literal('month'), no_label, year, month, total, count
+    ).group_by(year, month)
+    
+    return union_all(overall, by_category, by_vendor, by_type, by_month)
+
+def spend_summary(purchase_filter):
+    # Totals are in minor units of purchase_filter.currency; see
+    # PurchaseFilter.in_currency().
+    summary = {
+        'currency': purchase_filter.currency,
+        'total_spend': 0,
+        'purchase_count': 0,
+        'category_totals': [],
+        'vendor_totals': [],
+        'type_totals': [],
+        'monthly_totals': []
+    }
+    
+    # One statement, one scan of the filtered rows; the five dashboard
+    # aggregates are split back out of the tagged result rows here.
+    source = spend_source(purchase_filter)
+    stmt = purchase_filter.statement(('summary', source), lambda f: summary_statement(f, source))
+    for row in db.session.execute(stmt, purchase_filter.params):
+        if row.dimension == 'total':
+            summary['total_spend'] = int(row.total or 0)
+            summary['purchase_count'] = int(row.purchase_count or 0)
+        elif row.dimension == 'category':
+            summary['category_totals'].append((row.label, int(row.total)))
+        elif row.dimension == 'vendor':
+            summary['vendor_totals'].append((row.label, int(row.total)))
+        elif row.dimension == 'type':
+            summary['type_totals'].append((row.label, int(row.total)))
+        elif row.dimension == 'month':
+            summary['monthly_totals'].append((row.year, row.month, int(row.total)))
+    
+    summary['vendor_totals'].sort(key=lambda item: item[1], reverse=True)
+    summary['monthly_totals'].sort()
+    return summary
+
+GRANULARITIES = ('day', 'week', 'month')
+
+def period_start(day, granularity):
+    # First day of the period a date falls in; weeks start on Monday.
+    if granularity == 'day':
+        return day
+    if db.engine.dialect.name == 'sqlite':
+        if granularity == 'week':
+            return func.date(day, 'weekday 0', '-6 days')
+        return func.date(day, 'start of month')
+    return func.date(func.date_trunc(granularity, day))
+
+def series_statement(purchase_filter, granularity='month', source=SpendRollup):
+    spend = _filtered_spend(purchase_filter, source)
+    period = period_start(spend.c.day, granularity).label('period')
+    return select(
+        period,
+        func.sum(spend.c.total).label('total'),
+        func.sum(spend.c.purchase_count).label('purchase_count')
+    ).group_by(period).order_by(period)
+
+def spend_series(purchase_filter, granularity='month'):
+    source = spend_source(purchase_filter)
+    stmt = purchase_filter.statement((f'series_{granularity}', source), lambda f: series_statement(f, granularity, source))
+    return [
+        {'period': str(row.period), 'total_minor': int(row.total or 0), 'purchase_count': int(row.purchase_count or 0)}
+        for row in db.session.execute(stmt, purchase_filter.params)
+    ]
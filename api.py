@@ -0,0 +1,60 @@
+from flask import jsonify, request
+from money import to_major
+
+def major_units(minor, currency):
+    return float(to_major(minor, currency))
+
+PURCHASE_FIELDS = {
+    'id': lambda p: p.id,
+    'date': lambda p: p.date_collected.isoformat(),
+    'description': lambda p: p.description,
+    'vendor': lambda p: p.vendor,
+    'type': lambda p: p.purchase_type,
+    'category_id': lambda p: p.category_id,
+    'category': lambda p: p.category.name if p.category else None,
+    'quantity': lambda p: p.quantity,
+    # Numbers in the major unit for convenience; the *_minor integers are
+    # the exact stored values.
+    'currency': lambda p: p.currency,
+    'amount': lambda p: major_units(p.amount_minor, p.currency),
+    'amount_minor': lambda p: p.amount_minor,
+    'total': lambda p: major_units(p.total_minor, p.currency),
+    'total_minor': lambda p: p.total_minor,
+    'paid_on_collection': lambda p: bool(p.paid_on_collection),
+    'notes': lambda p: p.notes,
+    'uploaded_by': lambda p: p.user.username,
+    'attachment_url': lambda p: p.attachment_url,
+    'attachment_status': lambda p: p.attachment.status if p.attachment else None,
+    'thumbnail_url': lambda p: p.attachment.thumbnail_url if p.attachment else None,
+}
+
+def spend_json(key, totals, currency):
+    return [{key: label, 'total': major_units(total, currency), 'total_minor': total} for label, total in totals]
+
+class FieldError(ValueError):
+    pass
+
+def parse_fields(value):
+    # Comma-separated field names; everything when the parameter is absent.
+    if not value:
+        return list(PURCHASE_FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in PURCHASE_FIELDS]
+    if unknown:
+        raise FieldError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+def purchase_json(purchase, fields):
+    return {name: PURCHASE_FIELDS[name](purchase) for name in fields}
+
+def conditional_json(payload):
+    # ETag over the serialized body, so a client revalidating an unchanged
+    # result gets a 304 without the body. There's no Last-Modified: no
+    # timestamp moves on every write that changes a result (edits, archive
+    # runs, category renames), and a stale one would answer
+    # If-Modified-Since with a wrong 304.
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
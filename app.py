@@ -1,66 +1,71 @@
-from flask import Flask
+from flask import Flask, request
+from flask.cli import AppGroup
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
-from models import db, User, Category
+from models import db
 from config import Config
+from database import init_database
+from cache import init_cache
+from attachments import init_attachment_processor
+from storage import init_attachment_storage
+from audit import init_audit_writer
+from user_cache import init_user_cache, load_session_user
+from throttle import init_login_throttle
+from metrics import init_metrics
+from serving import init_serving
 import os
 
-def seed_categories():
-    initial_categories = [
-        'Office Supplies',
-        'Electronics',
-        'Services',
-        'Miscellaneous'
-    ]
+class LazyCommands(AppGroup):
+    # The app's `flask` commands, and Flask-Migrate/Alembic behind `flask db`,
+    # are imported the first time the CLI looks a command up. Serving
+    # requests never pays for them.
     
-    for cat_name in initial_categories:
-        if not Category.query.filter_by(name=cat_name).first():
-            category = Category(name=cat_name, description='')
-            db.session.add(category)
+    def __init__(self, app):
+        super().__init__(app.name)
+        self.app = app
+        self._loaded = False
     
-    db.session.commit()
-
-def seed_dev_users():
-    dev_users = [
-        {
-            'username': 'shopper',
-            'email': 'shopper@dev.com',
-            'password': 'shopper123',
-            'role': 'shopper'
-        },
-        {
-            'username': 'admin',
-            'email': 'admin@dev.com',
-            'password': 'admin123',
-            'role': 'admin'
-        },
-        {
-            'username': 'dev',
-            'email': 'dev@dev.com',
-            'password': 'dev123',
-            'role': 'dev'
-        }
-    ]
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        from flask_migrate import Migrate
+        from archive import include_object
+        from commands import register_commands
+        Migrate(self.app, db, include_object=include_object)
+        register_commands(self.app)
     
-    for user_data in dev_users:
-        if not User.query.filter_by(username=user_data['username']).first():
-            user = User(
-                username=user_data['username'],
-                email=user_data['email'],
-                role=user_data['role']
-            )
-            user.set_password(user_data['password'])
-            db.session.add(user)
+    def list_commands(self, ctx):
+        self._load()
+        return super().list_commands(ctx)
     
-    db.session.commit()
+    def get_command(self, ctx, name):
+        self._load()
+        return super().get_command(ctx, name)
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.cli = LazyCommands(app)
+    
+    init_database(app)
+    init_metrics(app)
+    # After metrics: after_request hooks run in reverse, so compression is
+    # part of the timed request.
+    init_serving(app)
+    init_cache(app)
+    init_attachment_storage(app)
+    init_attachment_processor(app)
+    init_audit_writer(app)
+    init_user_cache(app)
+    init_login_throttle(app)
+    
+    @app.before_request
+    def raise_import_upload_limit():
+        # Registered ahead of CSRFProtect, which parses the form body first.
+        if request.endpoint == 'bulk_import':
+            request.max_content_length = app.config['IMPORT_MAX_CONTENT_LENGTH']
     
-    db.init_app(app)
-    migrate = Migrate(app, db)
     csrf = CSRFProtect(app)
     
     login_manager = LoginManager()
@@ -70,13 +75,10 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
-    
-    with app.app_context():
-        db.create_all()
-        seed_categories()
-        seed_dev_users()
+        return load_session_user(int(user_id))
     
+    # Schema and seed data are set up once with `flask init-db` and
+    # `flask seed`; creating the app doesn't touch the database.
     from routes import register_routes
     register_routes(app)
     
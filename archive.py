@@ -0,0 +1,140 @@
+import re
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import MetaData, Table, Column, Index, select, insert, delete, extract, inspect, text, union_all
+from sqlalchemy.orm import aliased
+from models import db, Purchase, AuditLog
+from search import include_object as search_include_object
+
+HISTORY_VIEW = 'purchases_history'
+ARCHIVE_PATTERN = re.compile(r'^purchases_archive_(\d{4})$')
+
+# Archive tables are created on demand, one pair per year, so they live
+# outside db.metadata: create_all and Alembic never see them.
+archive_metadata = MetaData()
+
+def _copy_columns(source):
+    return [Column(column.name, column.type, primary_key=column.primary_key) for column in source.columns]
+
+def purchases_archive(year):
+    name = f'purchases_archive_{year}'
+    if name in archive_metadata.tables:
+        return archive_metadata.tables[name]
+    return Table(
+        name, archive_metadata,
+        *_copy_columns(Purchase.__table__),
+        Index(f'ix_{name}_date_collected_id', 'date_collected', 'id')
+    )
+
+def audit_logs_archive(year):
+    name = f'audit_logs_archive_{year}'
+    if name in archive_metadata.tables:
+        return archive_metadata.tables[name]
+    return Table(
+        name, archive_metadata,
+        *_copy_columns(AuditLog.__table__),
+        Index(f'ix_{name}_purchase_timestamp', 'purchase_id', 'timestamp')
+    )
+
+history_view = Table(HISTORY_VIEW, archive_metadata, *_copy_columns(Purchase.__table__))
+
+# Purchase mapped onto the union of the hot table and every archive year,
+# for queries that need all of history.
+PurchaseHistory = aliased(Purchase, history_view, adapt_on_names=True)
+
+def archive_cutoff(today=None):
+    today = today or date.today()
+    return today - timedelta(days=current_app.config['ARCHIVE_HORIZON_DAYS'])
+
+def archive_years():
+    years = []
+    for name in inspect(db.engine).get_table_names():
+        match = ARCHIVE_PATTERN.match(name)
+        if match:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+def refresh_history_view(years=None):
+    years = archive_years() if years is None else years
+    columns = [column.name for column in Purchase.__table__.columns]
+    parts = [select(*[Purchase.__table__.c[name] for name in columns])]
+    for year in years:
+        table = purchases_archive(year)
+        parts.append(select(*[table.c[name] for name in columns]))
+    
+    view_sql = union_all(*parts).compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    db.session.execute(text(f'DROP VIEW IF EXISTS {HISTORY_VIEW}'))
+    db.session.execute(text(f'CREATE VIEW {HISTORY_VIEW} AS {view_sql}'))
+
+def _archive_year(year, cutoff):
+    purchases = purchases_archive(year)
+    audit_logs = audit_logs_archive(year)
+    purchases.create(db.session.connection(), checkfirst=True)
+    audit_logs.create(db.session.connection(), checkfirst=True)
+    
+    end = min(cutoff, date(year + 1, 1, 1))
+    in_year = (Purchase.date_collected >= date(year, 1, 1)) & (Purchase.date_collected < end)
+    purchase_ids = select(Purchase.id).where(in_year)
+    
+    purchase_columns = [column.name for column in Purchase.__table__.columns]
+    audit_columns = [column.name for column in AuditLog.__table__.columns]
+    db.session.execute(insert(purchases).from_select(
+        purchase_columns,
+        select(*[Purchase.__table__.c[name] for name in purchase_columns]).where(in_year)
+    ))
+    db.session.execute(insert(audit_logs).from_select(
+        audit_columns,
+        select(*[AuditLog.__table__.c[name] for name in audit_columns]).where(AuditLog.purchase_id.in_(purchase_ids))
+    ))
+    db.session.execute(
+        delete(AuditLog).where(AuditLog.purchase_id.in_(purchase_ids)).execution_options(synchronize_session=False)
+    )
+    # Rollups are left alone: archived purchases keep counting towards every
+    # dashboard total, only their detail rows move out of the hot tables.
+    return db.session.execute(
+        delete(Purchase).where(in_year).execution_options(synchronize_session=False)
+    ).rowcount
+
+def archive_purchases(cutoff=None):
+    # Moves purchases dated before the cutoff, and their audit logs, into
+    # per-year archive tables; one transaction per year.
+    cutoff = cutoff or archive_cutoff()
+    years = db.session.execute(
+        select(extract('year', Purchase.date_collected).label('year'))
+        .where(Purchase.date_collected < cutoff)
+        .distinct()
+    ).scalars().all()
+    
+    moved = {}
+    for year in sorted(int(year) for year in years):
+        moved[year] = _archive_year(year, cutoff)
+        refresh_history_view(sorted(set(archive_years()) | {year}))
+        db.session.commit()
+    return moved
+
+def needs_history(date_from=None):
+    # Archive tables only ever hold whole years up to the newest one, so a
+    # range starting after that year never has to look past the hot table.
+    years = archive_years()
+    return bool(years) and (date_from is None or date_from.year <= years[-1])
+
+def archived_year(purchase_id):
+    # The archive year holding a purchase no longer in the hot table; its
+    # audit logs were moved to the same year's table.
+    if not archive_years():
+        return None
+    date_collected = db.session.execute(
+        select(history_view.c.date_collected).where(history_view.c.id == purchase_id)
+    ).scalar()
+    return date_collected.year if date_collected else None
+
+def purchase_source(date_from=None):
+    return PurchaseHistory if needs_history(date_from) else Purchase
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Archive tables are created at runtime; keep autogenerate from
+    # proposing to drop them, on top of the FTS tables search.py excludes.
+    if type_ == 'table' and reflected and compare_to is None:
+        if ARCHIVE_PATTERN.match(name) or name.startswith('audit_logs_archive_'):
+            return False
+    return search_include_object(obj, name, type_, reflected, compare_to)
@@ -0,0 +1,186 @@
+import hashlib
+import io
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from importlib.util import find_spec
+from flask import current_app
+from sqlalchemy import update
+from models import db, Attachment, Purchase
+from storage import get_attachment_storage, store_blob, release_blob, abandon_blobs
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png'}
+HASH_CHUNK_SIZE = 64 * 1024
+
+def hash_file(f):
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+def pillow_available():
+    # Pillow is optional, and only the worker needs it, so it's imported
+    # inside the image functions rather than when the app starts.
+    return find_spec('PIL') is not None
+
+def is_image(filename):
+    return filename.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS
+
+def normalize_image(f, max_dimension):
+    from PIL import Image
+    # Phone photos of receipts are routinely several thousand pixels wide;
+    # cap the longest side so stored files stay small enough to view inline.
+    with Image.open(f) as image:
+        if max(image.size) <= max_dimension:
+            return None
+        image_format = image.format
+        image.thumbnail((max_dimension, max_dimension))
+        output = io.BytesIO()
+        image.save(output, format=image_format, optimize=True)
+    output.seek(0)
+    return output
+
+def make_thumbnail(f, size):
+    from PIL import Image
+    with Image.open(f) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=80, optimize=True)
+    output.seek(0)
+    return output
+
+def _replace_file(attachment, stored):
+    # Attachments can share a blob, so the resized copy is a new blob and
+    # the original just loses this attachment's reference.
+    release_blob(attachment.filename)
+    attachment.filename = stored.key
+    attachment.sha256 = stored.sha256
+    attachment.size = stored.size
+    db.session.execute(
+        update(Purchase)
+        .where(Purchase.attachment_id == attachment.id)
+        .values(attachment_url=attachment.url)
+        .execution_options(synchronize_session=False)
+    )
+
+def process_attachment(attachment_id):
+    attachment = db.session.get(Attachment, attachment_id)
+    if attachment is None or attachment.status == 'ready':
+        return
+    
+    attachment.status = 'processing'
+    db.session.commit()
+    
+    config = current_app.config
+    storage = get_attachment_storage()
+    written = []
+    try:
+        if pillow_available() and is_image(attachment.filename):
+            extension = os.path.splitext(attachment.filename)[1]
+            with storage.open(attachment.filename) as f:
+                resized = normalize_image(f, config['ATTACHMENT_MAX_DIMENSION'])
+            if resized is not None:
+                written.append(store_blob(resized, extension))
+                _replace_file(attachment, written[-1])
+            
+            with storage.open(attachment.filename) as f:
+                thumbnail = store_blob(make_thumbnail(f, config['ATTACHMENT_THUMBNAIL_SIZE']), '.jpg')
+            written.append(thumbnail)
+            # Reprocessing can produce the same thumbnail; the new reference
+            # then just replaces the old one.
+            if attachment.thumbnail_filename:
+                release_blob(attachment.thumbnail_filename)
+            attachment.thumbnail_filename = thumbnail.key
+        
+        if attachment.sha256 is None:
+            # Uploaded before content-addressed storage; hash it in place.
+            with storage.open(attachment.filename) as f:
+                attachment.sha256, attachment.size = hash_file(f)
+        attachment.status = 'ready'
+        attachment.error = None
+    except Exception as e:
+        logger.exception('Processing attachment %s failed', attachment_id)
+        db.session.rollback()
+        # The rollback took the new files' blob rows with it.
+        abandon_blobs(written)
+        attachment = db.session.get(Attachment, attachment_id)
+        attachment.status = 'failed'
+        attachment.error = str(e)
+    
+    attachment.processed_at = datetime.utcnow()
+    db.session.commit()
+
+class AttachmentProcessor:
+    # A small pool of daemon threads fed from a local queue. Work is tracked
+    # in the attachments table, so anything still queued when the process
+    # exits stays 'pending' and 'flask attachments process' picks it up.
+    
+    def __init__(self, app, workers=2):
+        self.app = app
+        self.workers = workers
+        self.queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+    
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f'attachment-worker-{index}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+    
+    def _run(self):
+        while True:
+            attachment_id = self.queue.get()
+            try:
+                with self.app.app_context():
+                    process_attachment(attachment_id)
+            except Exception:
+                logger.exception('Attachment worker crashed on %s', attachment_id)
+            finally:
+                self.queue.task_done()
+    
+    def submit(self, attachment_id):
+        if self.workers <= 0:
+            process_attachment(attachment_id)
+            return
+        self._start()
+        self.queue.put(attachment_id)
+    
+    def join(self):
+        self.queue.join()
+
+def init_attachment_processor(app):
+    app.extensions['attachment_processor'] = AttachmentProcessor(
+        app,
+        workers=app.config['ATTACHMENT_WORKERS']
+    )
+
+def get_attachment_processor():
+    return current_app.extensions['attachment_processor']
+
+def process_pending_attachments(include_failed=False):
+    statuses = ['pending', 'processing']
+    if include_failed:
+        statuses.append('failed')
+    pending_ids = db.session.query(Attachment.id).filter(Attachment.status.in_(statuses)).all()
+    for (attachment_id,) in pending_ids:
+        attachment = db.session.get(Attachment, attachment_id)
+        attachment.status = 'pending'
+        db.session.commit()
+        process_attachment(attachment_id)
+    return len(pending_ids)
@@ -0,0 +1,149 @@
+import atexit
+import json
+import logging
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert, select
+from models import db, AuditLog
+
+logger = logging.getLogger(__name__)
+
+def _encode_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def compact_changes(values, previous=None):
+    # Only what changed: against the previous values for an update, against
+    # nothing for a create, so empty fields aren't stored at all.
+    previous = previous or {}
+    diff = {}
+    for name, value in values.items():
+        value = _encode_value(value)
+        if name in previous:
+            if _encode_value(previous[name]) == value:
+                continue
+        elif value is None or value == '':
+            continue
+        diff[name] = value
+    if not diff:
+        return None
+    return json.dumps(diff, separators=(',', ':'), sort_keys=True)
+
+def audit_row(purchase_id, user_id, action, values, previous=None):
+    return {
+        'purchase_id': purchase_id,
+        'user_id': user_id,
+        'action': action,
+        'changes': compact_changes(values, previous),
+        'timestamp': datetime.utcnow()
+    }
+
+def write_audit_rows(rows):
+    if rows:
+        db.session.execute(insert(AuditLog), rows)
+
+class AuditWriter:
+    # Buffers audit rows in memory and appends them in one multi-row INSERT
+    # from a background thread, every flush_interval seconds or as soon as
+    # batch_size rows are waiting. Rows are timestamped when recorded, not
+    # when written. Anything still buffered is written at interpreter exit;
+    # a hard crash loses at most one interval's worth of events.
+    
+    def __init__(self, app, batch_size=100, flush_interval=2.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+    
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+    
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Audit writer flush failed')
+    
+    def record(self, purchase_id, user_id, action, values, previous=None):
+        row = audit_row(purchase_id, user_id, action, values, previous)
+        if self.flush_interval <= 0:
+            with self.app.app_context():
+                write_audit_rows([row])
+                db.session.commit()
+            return
+        
+        self._start()
+        with self._lock:
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+    
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows, self.buffer = self.buffer, []
+            if not rows:
+                return 0
+            try:
+                with self.app.app_context():
+                    write_audit_rows(rows)
+                    db.session.commit()
+            except Exception:
+                # Put the rows back in front so the next flush retries them.
+                with self._lock:
+                    self.buffer[:0] = rows
+                raise
+            return len(rows)
+    
+    def pending(self):
+        with self._lock:
+            return len(self.buffer)
+
+def init_audit_writer(app):
+    app.extensions['audit_writer'] = AuditWriter(
+        app,
+        batch_size=app.config['AUDIT_BATCH_SIZE'],
+        flush_interval=app.config['AUDIT_FLUSH_INTERVAL']
+    )
+
+def get_audit_writer():
+    return current_app.extensions['audit_writer']
+
+def history_statement(purchase_id, limit=50, before=None, table=None):
+    # Newest first, served by ix_audit_logs_purchase_timestamp (or the same
+    # index on an archive table). Pass the oldest timestamp of one page as
+    # `before` to get the next.
+    table = AuditLog.__table__ if table is None else table
+    stmt = select(table).where(table.c.purchase_id == purchase_id)
+    if before is not None:
+        stmt = stmt.where(table.c.timestamp < before)
+    return stmt.order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(limit)
+
+def purchase_history(purchase_id, limit=50, before=None, table=None):
+    # Write out anything still buffered so a purchase's own latest events show.
+    get_audit_writer().flush()
+    return [
+        {
+            'id': log.id,
+            'action': log.action,
+            'user_id': log.user_id,
+            'timestamp': log.timestamp.isoformat(),
+            'changes': json.loads(log.changes) if log.changes else {}
+        }
+        for log in db.session.execute(history_statement(purchase_id, limit, before, table))
+    ]
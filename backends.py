@@ -0,0 +1,9 @@
+from importlib import import_module
+
+def load_backend(name, builtin):
+    # A short name picks one of the module's own backends; anything else is
+    # a dotted path to a class, e.g. 'myapp.redis_cache.RedisBackend'.
+    if name in builtin:
+        return builtin[name]
+    module_name, _, class_name = name.rpartition('.')
+    return getattr(import_module(module_name), class_name)
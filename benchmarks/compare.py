@@ -0,0 +1,42 @@
+import argparse
+import json
+
+METRICS = [
+    ('p50 ms', lambda s: s['latency_ms']['p50'], False),
+    ('p95 ms', lambda s: s['latency_ms']['p95'], False),
+    ('p99 ms', lambda s: s['latency_ms']['p99'], False),
+    ('req/s', lambda s: s['throughput_rps'], True),
+    ('peak MB', lambda s: s['peak_traced_mb'], False),
+]
+
+def change(before, after, higher_is_better):
+    if not before:
+        return ''
+    delta = (after - before) / before * 100
+    better = delta > 0 if higher_is_better else delta < 0
+    return f"{delta:+.1f}%{' better' if better and abs(delta) >= 1 else ''}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmarks/load.py result files.')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+    
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    
+    print(f"before: {before.get('commit')} {before.get('timestamp')}  {before.get('data')}")
+    print(f"after:  {after.get('commit')} {after.get('timestamp')}  {after.get('data')}")
+    for name in before['scenarios']:
+        if name not in after['scenarios']:
+            continue
+        print(f'\n{name}')
+        for label, value, higher_is_better in METRICS:
+            old = value(before['scenarios'][name])
+            new = value(after['scenarios'][name])
+            print(f'  {label:<8} {old:>10.2f} -> {new:>10.2f}  {change(old, new, higher_is_better)}')
+
+if __name__ == '__main__':
+    main()
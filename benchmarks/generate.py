@@ -0,0 +1,212 @@
+import argparse
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from common import DEFAULT_DATABASE, bench_app
+
+SCALES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+VENDOR_STEMS = [
+    'Office Depot', 'Staples', 'Amazon', 'Best Buy', 'Costco', 'Walmart', 'Target', 'Home Depot',
+    'Lowe\'s', 'Dell', 'Apple', 'Microsoft', 'Adobe', 'FedEx', 'UPS', 'Uline', 'Grainger',
+    'CDW', 'Newegg', 'B&H Photo', 'IKEA', 'Whole Foods', 'Trader Joe\'s', 'Shell', 'Chevron',
+    'Uber', 'Lyft', 'Delta', 'United', 'Marriott', 'Hilton', 'Zoom', 'Slack', 'Atlassian',
+    'GitHub', 'AWS', 'Google Cloud', 'DigitalOcean', 'Verizon', 'AT&T', 'Comcast', 'WeWork',
+]
+VENDOR_SUFFIXES = ['', ' Online', ' Business', ' Store #{n}', ' Services']
+EXTRA_CATEGORIES = ['Travel', 'Software', 'Utilities', 'Food & Drink', 'Shipping', 'Facilities']
+ITEMS = [
+    'printer paper', 'toner cartridge', 'laptop', 'monitor', 'keyboard', 'USB-C hub', 'desk chair',
+    'standing desk', 'coffee beans', 'team lunch', 'flight', 'hotel night', 'taxi', 'software license',
+    'cloud hosting', 'phone bill', 'internet service', 'shipping labels', 'cleaning service',
+    'conference ticket', 'cables', 'notebooks', 'pens', 'whiteboard markers', 'headset', 'webcam',
+]
+NOTES = ['Urgent order', 'Reimbursable', 'Quarterly renewal', 'Client project', 'Replacement', 'Bulk discount']
+
+def vendor_names(count, rng):
+    names = []
+    while len(names) < count:
+        stem = VENDOR_STEMS[len(names) % len(VENDOR_STEMS)]
+        suffix = rng.choice(VENDOR_SUFFIXES).format(n=rng.randint(100, 999))
+        name = stem + suffix
+        if name not in names:
+            names.append(name)
+    return names
+
+def zipf_weights(count, exponent=1.1):
+    # A few vendors take most of the purchases, with a long tail.
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+def day_weights(start, days):
+    # More purchases on weekdays, a December peak and steady growth towards
+    # the present.
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weight = 1.0 if day.weekday() < 5 else 0.35
+        if day.month == 12:
+            weight *= 1.6
+        elif day.month in (7, 8):
+            weight *= 0.8
+        weight *= 0.5 + offset / days
+        weights.append(weight)
+    return weights
+
+def cumulative(weights):
+    total = 0.0
+    result = []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+def amount_minor_for(rng):
+    # Log-normal, in cents: mostly tens of dollars, occasionally thousands.
+    return max(50, round(math.exp(rng.gauss(3.4, 1.1)) * 100))
+
+def generate(app, purchases, users, vendors, years, end, batch_size, seed, audit_ratio):
+    from sqlalchemy import insert, select, func
+    from models import db, User, Category, Purchase, AuditLog
+    from audit import compact_changes
+    from rollups import rebuild_rollups
+    
+    rng = random.Random(seed)
+    runner = app.test_cli_runner()
+    for command in (['init-db'], ['seed']):
+        result = runner.invoke(args=command)
+        if result.exit_code != 0:
+            raise SystemExit(result.output)
+    
+    with app.app_context():
+        existing = db.session.execute(select(func.count(Purchase.id))).scalar()
+        if existing:
+            raise SystemExit(f'The database already has {existing} purchases; point --database at an empty one.')
+        
+        for name in EXTRA_CATEGORIES:
+            if db.session.execute(select(Category.id).where(Category.name == name)).first() is None:
+                db.session.add(Category(name=name, description=''))
+        db.session.commit()
+        category_ids = db.session.execute(select(Category.id).order_by(Category.id)).scalars().all()
+        
+        # One hash shared by every generated shopper: hashing thousands of
+        # passwords would dominate the run.
+        template = User(username='template', email='template@example.com', role='shopper')
+        template.set_password('bench123')
+        db.session.execute(insert(User), [
+            {
+                'username': f'bench_shopper_{n}',
+                'email': f'bench_shopper_{n}@example.com',
+                'password': template.password,
+                'role': 'shopper',
+            }
+            for n in range(users)
+        ])
+        db.session.commit()
+        user_ids = db.session.execute(select(User.id).where(User.role == 'shopper')).scalars().all()
+        
+        vendor_list = vendor_names(vendors, rng)
+        vendor_cum = cumulative(zipf_weights(len(vendor_list)))
+        vendor_category = {vendor: rng.choice(category_ids) for vendor in vendor_list}
+        
+        start = end - timedelta(days=365 * years)
+        days = (end - start).days + 1
+        day_cum = cumulative(day_weights(start, days))
+        
+        next_id = (db.session.execute(select(func.max(Purchase.id))).scalar() or 0) + 1
+        written = 0
+        started = time.perf_counter()
+        while written < purchases:
+            count = min(batch_size, purchases - written)
+            chosen_vendors = rng.choices(vendor_list, cum_weights=vendor_cum, k=count)
+            chosen_days = rng.choices(range(days), cum_weights=day_cum, k=count)
+            rows = []
+            audit_rows = []
+            for index in range(count):
+                vendor = chosen_vendors[index]
+                day = start + timedelta(days=chosen_days[index])
+                created_at = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(8 * 3600, 20 * 3600))
+                user_id = rng.choice(user_ids)
+                row = {
+                    'id': next_id + index,
+                    'user_id': user_id,
+                    'description': rng.choice(ITEMS).capitalize(),
+                    'amount_minor': amount_minor_for(rng),
+                    'currency': 'USD',
+                    'quantity': rng.choices((1, 2, 3, 4, 5, 10), weights=(70, 12, 7, 4, 4, 3))[0],
+                    'vendor': vendor,
+                    'date_collected': day,
+                    'purchase_type': 'product' if rng.random() < 0.7 else 'service',
+                    'category_id': vendor_category[vendor] if rng.random() < 0.9 else rng.choice(category_ids + [None]),
+                    'notes': rng.choice(NOTES) if rng.random() < 0.3 else None,
+                    'paid_on_collection': 1 if rng.random() < 0.8 else 0,
+                    'created_at': created_at,
+                }
+                rows.append(row)
+                values = {name: row[name] for name in ('description', 'amount_minor', 'currency', 'quantity', 'vendor', 'date_collected', 'purchase_type', 'category_id', 'notes', 'paid_on_collection')}
+                audit_rows.append({
+                    'purchase_id': row['id'],
+                    'user_id': user_id,
+                    'action': 'create',
+                    'changes': compact_changes(values),
+                    'timestamp': created_at,
+                })
+                if rng.random() < audit_ratio:
+                    audit_rows.append({
+                        'purchase_id': row['id'],
+                        'user_id': user_id,
+                        'action': 'update',
+                        'changes': compact_changes({'notes': rng.choice(NOTES)}, {'notes': row['notes']}),
+                        'timestamp': created_at + timedelta(hours=rng.randint(1, 72)),
+                    })
+            
+            db.session.execute(insert(Purchase), rows)
+            db.session.execute(insert(AuditLog), audit_rows)
+            db.session.commit()
+            next_id += count
+            written += count
+            rate = written / (time.perf_counter() - started)
+            print(f'\r{written:>12,} / {purchases:,} purchases  ({rate:,.0f} rows/s)', end='', flush=True)
+        print()
+        
+        rebuild_rollups()
+        db.session.commit()
+        
+        return {
+            'users': db.session.execute(select(func.count(User.id))).scalar(),
+            'categories': db.session.execute(select(func.count(Category.id))).scalar(),
+            'purchases': db.session.execute(select(func.count(Purchase.id))).scalar(),
+            'audit_logs': db.session.execute(select(func.count(AuditLog.id))).scalar(),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill a database with synthetic users, purchases and audit logs for benchmarking.')
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help='SQLAlchemy URL of an empty database (relative SQLite paths land in instance/).')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k', help='Number of purchases.')
+    parser.add_argument('--purchases', type=int, help='Exact number of purchases; overrides --scale.')
+    parser.add_argument('--users', type=int, help='Defaults to one shopper per 2,000 purchases (at least 10).')
+    parser.add_argument('--vendors', type=int, default=200)
+    parser.add_argument('--years', type=int, default=3, help='How far back purchase dates go.')
+    parser.add_argument('--end-date', type=date.fromisoformat, default=date.today(), help='Newest purchase date (YYYY-MM-DD); defaults to today.')
+    parser.add_argument('--audit-ratio', type=float, default=0.2, help='Share of purchases that also get an update event.')
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42, help='Same seed, same data.')
+    args = parser.parse_args()
+    
+    purchases = args.purchases or SCALES[args.scale]
+    users = args.users or max(10, purchases // 2000)
+    
+    started = time.perf_counter()
+    counts = generate(
+        bench_app(args.database), purchases, users, args.vendors, args.years, args.end_date,
+        args.batch_size, args.seed, args.audit_ratio
+    )
+    elapsed = time.perf_counter() - started
+    print(', '.join(f'{count:,} {table}' for table, count in counts.items()) + f' in {elapsed:.1f} s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import json
+import platform
+import re
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+from common import DEFAULT_DATABASE, bench_app, git_commit
+
+SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+LOGINS = {
+    'admin': ('admin', 'admin123'),
+    'shopper': ('shopper', 'shopper123'),
+}
+
+def load_context(app):
+    # Filter values that exist in the generated data, so every scenario
+    # request hits real rows.
+    from sqlalchemy import select, func
+    from models import db, Category, Purchase, SpendRollup
+    from pagination import encode_cursor
+    
+    with app.app_context():
+        newest = db.session.execute(select(func.max(Purchase.date_collected))).scalar()
+        if newest is None:
+            raise SystemExit('No purchases found; run benchmarks/generate.py first.')
+        vendors = db.session.execute(
+            select(SpendRollup.vendor).group_by(SpendRollup.vendor)
+            .order_by(func.sum(SpendRollup.purchase_count).desc()).limit(3)
+        ).scalars().all()
+        category_ids = db.session.execute(select(Category.id).order_by(Category.id)).scalars().all()
+        fiftieth = db.session.execute(
+            select(Purchase).order_by(Purchase.date_collected.desc(), Purchase.id.desc()).offset(49).limit(1)
+        ).scalar()
+        counts = {
+            'purchases': db.session.execute(select(func.count(Purchase.id))).scalar(),
+            'categories': len(category_ids),
+        }
+    
+    return {
+        'newest': newest,
+        'vendors': vendors,
+        'category_ids': category_ids,
+        'cursor': encode_cursor(fiftieth) if fiftieth else '',
+        'counts': counts,
+    }
+
+def _days_back(context, days):
+    return (context['newest'] - timedelta(days=days)).isoformat()
+
+def dashboard_requests(context):
+    newest = context['newest'].isoformat()
+    return [
+        ('GET', '/dashboard', {}),
+        ('GET', '/dashboard', {'query_string': {'vendor': context['vendors'][0]}}),
+        ('GET', '/dashboard', {'query_string': {'category': context['category_ids'][0]}}),
+        ('GET', '/dashboard', {'query_string': {'date_from': _days_back(context, 90), 'date_to': newest}}),
+        ('GET', '/dashboard', {'query_string': {'search': 'laptop'}}),
+        ('GET', '/dashboard', {'query_string': {'search': 'laptop', 'sort': 'relevance'}}),
+        ('GET', '/dashboard', {'query_string': {'cursor': context['cursor']}}),
+    ]
+
+def export_requests(context):
+    return [
+        ('GET', '/export', {'query_string': {'vendor': context['vendors'][0], 'date_from': _days_back(context, 30)}}),
+        ('GET', '/export', {'query_string': {'category': context['category_ids'][-1], 'date_from': _days_back(context, 90)}}),
+        ('GET', '/export', {'query_string': {'date_from': _days_back(context, 7)}}),
+    ]
+
+def upload_requests(context):
+    return [
+        ('POST', '/upload', {'data': {
+            'description': 'Benchmark purchase',
+            'amount': '42.50',
+            'quantity': '2',
+            'vendor': vendor,
+            'date_collected': context['newest'].isoformat(),
+            'purchase_type': 'product',
+            'category_id': str(context['category_ids'][0]),
+            'notes': 'Created by benchmarks/load.py',
+        }})
+        for vendor in context['vendors']
+    ]
+
+# name: (user it logs in as, request list). Upload writes purchases, so
+# it runs last by default.
+SCENARIOS = {
+    'dashboard': ('admin', dashboard_requests),
+    'export': ('admin', export_requests),
+    'upload': ('shopper', upload_requests),
+}
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return {name: round(ordered[0], 2) for name in ('p50', 'p90', 'p95', 'p99')}
+    cuts = statistics.quantiles(ordered, n=100, method='inclusive')
+    return {
+        'p50': round(cuts[49], 2),
+        'p90': round(cuts[89], 2),
+        'p95': round(cuts[94], 2),
+        'p99': round(cuts[98], 2),
+    }
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def issue(client, request):
+    method, path, kwargs = request
+    response = client.open(path, method=method, **kwargs)
+    # Reading the body drives streamed responses (the export) to the end.
+    size = len(response.get_data())
+    return response, size
+
+def run_scenario(app, name, context, requests, warmup, memory_requests):
+    role, build = SCENARIOS[name]
+    plan = build(context)
+    client = app.test_client()
+    username, password = LOGINS[role]
+    client.post('/login', data={'username': username, 'password': password})
+    
+    for index in range(warmup):
+        issue(client, plan[index % len(plan)])
+    
+    latencies = []
+    db_times = []
+    query_counts = []
+    statuses = Counter()
+    sent = 0
+    started = time.perf_counter()
+    for index in range(requests):
+        request_started = time.perf_counter()
+        response, size = issue(client, plan[index % len(plan)])
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        statuses[response.status_code] += 1
+        sent += size
+        timing = SERVER_TIMING.search(response.headers.get('Server-Timing', ''))
+        if timing:
+            db_times.append(float(timing.group(1)))
+            query_counts.append(int(timing.group(2)))
+    elapsed = time.perf_counter() - started
+    
+    # A separate pass under tracemalloc, which would otherwise slow down
+    # the timed requests.
+    tracemalloc.start()
+    for index in range(memory_requests):
+        issue(client, plan[index % len(plan)])
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'role': role,
+        'requests': requests,
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'latency_ms': {
+            'min': round(min(latencies), 2),
+            'mean': round(statistics.fmean(latencies), 2),
+            'max': round(max(latencies), 2),
+            **percentiles(latencies),
+        },
+        'db_ms': percentiles(db_times) if db_times else None,
+        'queries_per_request': round(statistics.fmean(query_counts), 2) if query_counts else None,
+        'throughput_rps': round(requests / elapsed, 2),
+        'bytes_per_request': round(sent / requests),
+        'peak_traced_mb': round(traced_peak / (1024 * 1024), 2),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the app through the Flask test client and report latency, throughput and memory.')
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help='A database filled by benchmarks/generate.py.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Comma-separated, from: {', '.join(SCENARIOS)}.")
+    parser.add_argument('--requests', type=int, default=100, help='Timed requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per scenario first.')
+    parser.add_argument('--memory-requests', type=int, default=5, help='Requests per scenario traced for peak memory.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+    
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    
+    app = bench_app(args.database)
+    context = load_context(app)
+    results = {
+        'benchmark': 'load',
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'data': context['counts'],
+        'settings': {'requests': args.requests, 'warmup': args.warmup, 'memory_requests': args.memory_requests},
+        'scenarios': {},
+    }
+    
+    print(f"{'scenario':<12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8} {'peak MB':>8} {'errors':>7}")
+    for name in names:
+        stats = run_scenario(app, name, context, args.requests, args.warmup, args.memory_requests)
+        results['scenarios'][name] = stats
+        latency = stats['latency_ms']
+        print(
+            f"{name:<12} {latency['p50']:>9.2f} {latency['p95']:>9.2f} {latency['p99']:>9.2f} "
+            f"{stats['throughput_rps']:>9.1f} {stats['queries_per_request'] or 0:>8.1f} "
+            f"{stats['peak_traced_mb']:>8.2f} {stats['errors']:>7}"
+        )
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
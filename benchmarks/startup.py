@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter each time so imports are cold, as they are
+# when a worker boots.
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported}))
+"""
+
+def measure_once():
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'min_ms': round(ordered[0] * 1000, 2),
+        'median_ms': round(statistics.median(ordered) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Time importing the app and running create_app().')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+    
+    runs = [measure_once() for _ in range(args.runs)]
+    results = {
+        'benchmark': 'startup',
+        'runs': args.runs,
+        'import': summarize([run['import'] for run in runs]),
+        'create_app': summarize([run['create_app'] for run in runs]),
+        'total': summarize([run['import'] + run['create_app'] for run in runs]),
+    }
+    
+    for phase in ('import', 'create_app', 'total'):
+        stats = results[phase]
+        print(f"{phase:<12} min {stats['min_ms']:>8.2f} ms  median {stats['median_ms']:>8.2f} ms  max {stats['max_ms']:>8.2f} ms")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context, g
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backends import load_backend
+from models import db, Category, Purchase, SpendRollup, CacheGeneration
+
+AGGREGATE_MODELS = (Purchase, Category, SpendRollup)
+GENERATION_NAME = 'aggregates'
+
+class CacheBackend:
+    # Minimal interface for aggregate cache storage. get() returns None on a
+    # miss; values are whatever the dashboard computes (lists of rows, dicts).
+    
+    @classmethod
+    def from_app(cls, app):
+        return cls()
+    
+    def get(self, key):
+        raise NotImplementedError
+    
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+    
+    def delete(self, key):
+        raise NotImplementedError
+    
+    def clear(self):
+        raise NotImplementedError
+    
+    def __len__(self):
+        return 0
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_app(cls, app):
+        return cls(max_entries=app.config['AGGREGATE_CACHE_MAX_ENTRIES'])
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+BACKENDS = {
+    'memory': MemoryCache,
+}
+
+class AggregateCache:
+    def __init__(self, backend, ttl=300, shared_generation=None):
+        self.backend = backend
+        self.ttl = ttl
+        # Returns the generation counter every process shares; a change means
+        # another process wrote since this one last looked.
+        self.shared_generation = shared_generation
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._shared_seen = None
+        self._lock = threading.Lock()
+    
+    def _sync(self):
+        if self.shared_generation is None:
+            return
+        shared = self.shared_generation()
+        with self._lock:
+            changed = self._shared_seen is not None and shared != self._shared_seen
+            self._shared_seen = shared
+        if changed:
+            self.invalidate()
+    
+    def get_or_compute(self, key, compute):
+        self._sync()
+        value = self.backend.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+        
+        with self._lock:
+            self.misses += 1
+            generation = self._generation
+        
+        value = compute()
+        
+        # Don't store a value computed while a write was invalidating the
+        # cache; the next request recomputes it from the new data.
+        if generation == self._generation:
+            self.backend.set(key, value, self.ttl)
+        return value
+    
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+        self.backend.clear()
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'entries': len(self.backend),
+        }
+
+def shared_generation():
+    # Read once per request, so every aggregate a request uses is checked
+    # against the same value for the cost of one primary-key lookup.
+    if 'aggregate_generation' not in g:
+        g.aggregate_generation = db.session.execute(
+            select(CacheGeneration.generation).where(CacheGeneration.name == GENERATION_NAME)
+        ).scalar() or 0
+    return g.aggregate_generation
+
+def bump_generation(session):
+    result = session.execute(
+        update(CacheGeneration)
+        .where(CacheGeneration.name == GENERATION_NAME)
+        .values(generation=CacheGeneration.generation + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return
+    
+    try:
+        with session.begin_nested():
+            session.execute(insert(CacheGeneration).values(name=GENERATION_NAME, generation=1))
+    except IntegrityError:
+        # Another writer created the row first.
+        bump_generation(session)
+
+def init_cache(app):
+    backend_class = load_backend(app.config['AGGREGATE_CACHE_BACKEND'], BACKENDS)
+    app.extensions['aggregate_cache'] = AggregateCache(
+        backend_class.from_app(app),
+        ttl=app.config['AGGREGATE_CACHE_TTL'],
+        shared_generation=shared_generation
+    )
+
+def get_aggregate_cache():
+    return current_app.extensions['aggregate_cache']
+
+def cache_key(name, filters=None):
+    return (name,) + tuple(sorted((filters or {}).items()))
+
+def invalidate_aggregates():
+    if has_app_context() and 'aggregate_cache' in current_app.extensions:
+        get_aggregate_cache().invalidate()
+
+def _touches_aggregates(objects):
+    return any(isinstance(obj, AGGREGATE_MODELS) for obj in objects)
+
+@event.listens_for(Session, 'after_flush')
+def _mark_dirty_on_flush(session, flush_context):
+    if _touches_aggregates(session.new) or _touches_aggregates(session.dirty) or _touches_aggregates(session.deleted):
+        session.info['aggregates_dirty'] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_dirty_on_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, AGGREGATE_MODELS):
+        orm_execute_state.session.info['aggregates_dirty'] = True
+
+@event.listens_for(Session, 'before_commit')
+def _bump_generation_on_commit(session):
+    # Flushed first so pending objects are seen; the bump then commits with
+    # the write it records, and the other processes drop their copies on
+    # their next read.
+    session.flush()
+    if session.info.get('aggregates_dirty'):
+        bump_generation(session)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop('aggregates_dirty', False):
+        invalidate_aggregates()
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_on_rollback(session):
+    session.info.pop('aggregates_dirty', None)
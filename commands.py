@@ -0,0 +1,144 @@
+import click
+from flask.cli import AppGroup
+from flask_migrate import upgrade, stamp
+from sqlalchemy import inspect
+from models import db, User
+from seed import seed_categories, seed_dev_users
+from rollups import rebuild_rollups, ensure_rollups
+from query_plans import check_query_plans
+from search import fts5_supported, ensure_search_index, rebuild_search_index
+from importer import import_purchases, detect_format
+from attachments import process_pending_attachments
+from storage import collect_garbage
+from archive import archive_purchases, archive_years, archive_cutoff, purchases_archive
+
+def register_commands(app):
+    
+    @app.cli.command('init-db')
+    def init_db():
+        """Create or upgrade the schema, search index and rollups."""
+        existing = bool(inspect(db.engine).get_table_names())
+        db.create_all()
+        if existing:
+            # create_all only adds missing tables; the migrations add the
+            # columns and indexes an older database is missing.
+            upgrade()
+        else:
+            stamp()
+        ensure_search_index(app)
+        ensure_rollups()
+        click.echo('Database ready.')
+    
+    @app.cli.command('seed')
+    @click.option('--no-dev-users', is_flag=True, help='Only seed categories.')
+    def seed(no_dev_users):
+        """Add the default categories and the shopper/admin/dev accounts."""
+        seed_categories()
+        if not no_dev_users:
+            seed_dev_users()
+        click.echo('Seed data added.')
+    
+    rollups_cli = AppGroup('rollups', help='Maintain the spend rollup tables.')
+    
+    @rollups_cli.command('rebuild')
+    def rollups_rebuild():
+        """Recompute every rollup row from the purchases table."""
+        groups = rebuild_rollups()
+        click.echo(f'Rebuilt spend rollups: {groups} groups.')
+    
+    app.cli.add_command(rollups_cli)
+    
+    search_cli = AppGroup('search', help='Maintain the full-text purchase search index.')
+    
+    @search_cli.command('rebuild')
+    def search_rebuild():
+        """Recreate the FTS5 index from the purchases table."""
+        if not fts5_supported():
+            raise click.ClickException('Full-text search needs SQLite built with FTS5.')
+        ensure_search_index(app)
+        rebuild_search_index()
+        click.echo('Rebuilt purchase search index.')
+    
+    app.cli.add_command(search_cli)
+    
+    attachments_cli = AppGroup('attachments', help='Manage uploaded purchase attachments.')
+    
+    @attachments_cli.command('process')
+    @click.option('--include-failed', is_flag=True, help='Also retry attachments that failed before.')
+    def attachments_process(include_failed):
+        """Process attachments left pending, e.g. after a restart."""
+        count = process_pending_attachments(include_failed=include_failed)
+        click.echo(f'Processed {count} attachments.')
+    
+    @attachments_cli.command('gc')
+    def attachments_gc():
+        """Delete stored files that no attachment references any more."""
+        count = collect_garbage()
+        click.echo(f'Removed {count} unreferenced files.')
+    
+    app.cli.add_command(attachments_cli)
+    
+    archive_cli = AppGroup('archive', help='Move old purchases out of the hot tables.')
+    
+    @archive_cli.command('run')
+    @click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), help='Defaults to today minus ARCHIVE_HORIZON_DAYS.')
+    def archive_run(before):
+        """Archive purchases and their audit logs into per-year tables."""
+        moved = archive_purchases(before.date() if before else None)
+        for year, count in moved.items():
+            click.echo(f'{year}: archived {count} purchases.')
+        click.echo(f'Archived {sum(moved.values())} purchases.')
+    
+    @archive_cli.command('status')
+    def archive_status():
+        """List archive years and their purchase counts."""
+        for year in archive_years():
+            count = db.session.query(purchases_archive(year)).count()
+            click.echo(f'{year}: {count} purchases')
+        click.echo(f'Archive horizon: {archive_cutoff().isoformat()}')
+    
+    app.cli.add_command(archive_cli)
+    
+    @app.cli.command('import-purchases')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--user', 'username', required=True, help='User recorded as the importer and default uploader.')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'json', 'jsonl']), help='Defaults to the file extension.')
+    @click.option('--batch-size', type=int, help='Rows per INSERT batch.')
+    def import_purchases_command(path, username, fmt, batch_size):
+        """Bulk import purchases from a CSV/JSON file in export format."""
+        importer = User.query.filter_by(username=username).first()
+        if importer is None:
+            raise click.ClickException(f'Unknown user: {username}')
+        
+        with open(path, 'rb') as stream:
+            report = import_purchases(
+                stream,
+                fmt or detect_format(path),
+                importer,
+                batch_size or app.config['IMPORT_BATCH_SIZE'],
+                app.config['CURRENCY']
+            )
+        
+        for row_number, message in report.errors:
+            click.echo(f'Row {row_number}: {message}', err=True)
+        click.echo(f'Imported {report.imported} purchases, {report.failed} rows rejected.')
+    
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', '-v', is_flag=True, help='Print the full plan for every query.')
+    def check_query_plans_command(verbose):
+        """EXPLAIN each dashboard/export query and fail on full table scans."""
+        if db.engine.dialect.name != 'sqlite':
+            raise click.ClickException('Query plan checks use EXPLAIN QUERY PLAN and require SQLite.')
+        
+        failures = 0
+        for result in check_query_plans():
+            status = 'FULL SCAN' if result['full_scans'] else 'ok'
+            click.echo(f"{result['query']:<20} {result['filters']:<14} {status}")
+            if result['full_scans'] or verbose:
+                for detail in result['plan']:
+                    click.echo(f'    {detail}')
+            if result['full_scans']:
+                failures += 1
+        
+        if failures:
+            raise click.ClickException(f'{failures} queries fall back to a full table scan.')
@@ -3,11 +3,101 @@ from datetime import timedelta
 
 class Config:
     SECRET_KEY = os.environ.get('SESSION_SECRET') or 'dev-secret-key-change-in-production'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///expendiforge.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///expendiforge.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Routes marked @read_replica read from here. Unset, a SQLite database
+    # gets a second read-only connection pool on the same file.
+    SQLALCHEMY_READ_DATABASE_URI = os.environ.get('DATABASE_READ_URL')
+    SQLITE_READ_ONLY_ENGINE = os.environ.get('SQLITE_READ_ONLY_ENGINE', '1') == '1'
+    
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    
+    # Applied to every new SQLite connection. WAL lets dashboard reads run
+    # alongside an upload's write, and busy_timeout makes writers wait for
+    # the lock instead of failing with "database is locked".
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -64000))
+    
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024
     ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png'}
+    ATTACHMENT_STORAGE = os.environ.get('ATTACHMENT_STORAGE', 'local')
+    ATTACHMENT_WORKERS = int(os.environ.get('ATTACHMENT_WORKERS', 2))
+    ATTACHMENT_MAX_DIMENSION = 2000
+    ATTACHMENT_THUMBNAIL_SIZE = 320
+    
+    PURCHASES_PER_PAGE = 50
+    MAX_PURCHASES_PER_PAGE = 500
+    EXPORT_BATCH_SIZE = 1000
+    IMPORT_BATCH_SIZE = 500
+    IMPORT_MAX_CONTENT_LENGTH = 100 * 1024 * 1024
+    
+    # New purchases default to CURRENCY, and dashboard totals are reported
+    # in it unless the filters pick another; CURRENCIES feeds the forms.
+    CURRENCY = os.environ.get('CURRENCY', 'USD')
+    CURRENCIES = ('USD', 'EUR', 'GBP', 'CAD', 'AUD', 'JPY')
+    # Dashboard rows in the reporting currency totalling more than this (in
+    # major units) are flagged; other currencies aren't comparable to it.
+    HIGH_SPEND_AMOUNT = 1000
+    
+    # Purchases dated further back than this are moved to per-year archive
+    # tables by 'flask archive run'.
+    ARCHIVE_HORIZON_DAYS = int(os.environ.get('ARCHIVE_HORIZON_DAYS', 730))
+    
+    AUDIT_BATCH_SIZE = 100
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 2.0))
+    
+    AGGREGATE_CACHE_BACKEND = os.environ.get('AGGREGATE_CACHE_BACKEND', 'memory')
+    AGGREGATE_CACHE_TTL = 300
+    AGGREGATE_CACHE_MAX_ENTRIES = 256
+    
+    # Any werkzeug method spec, e.g. 'scrypt:16384:8:1' or 'pbkdf2:sha256:600000'.
+    # Existing hashes are upgraded on the user's next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = 16
+    
+    # 'database' counts attempts in a table every worker process shares;
+    # 'memory' keeps them per process.
+    LOGIN_THROTTLE_BACKEND = os.environ.get('LOGIN_THROTTLE_BACKEND', 'database')
+    LOGIN_THROTTLE_WINDOW = 300
+    LOGIN_MAX_ATTEMPTS_PER_USERNAME = 5
+    LOGIN_MAX_ATTEMPTS_PER_IP = 20
+    LOGIN_THROTTLE_MAX_KEYS = 10000
+    
+    # How long a user's role and identity are trusted from the in-process
+    # cache or the session cookie before the users table is read again.
+    USER_CACHE_TTL = 60
+    USER_CACHE_MAX_ENTRIES = 1024
+    
+    # Request and query timing, shown on /dev and exported at /metrics for
+    # the dev role, or for a scraper sending 'Authorization: Bearer <token>'.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_RECENT_REQUESTS = 50
+    # Seconds; slower queries are logged with their SQL.
+    SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.25))
+    # The same statement this many times in one request is flagged as N+1.
+    N_PLUS_ONE_THRESHOLD = 10
+    
+    # HTML, CSV, JSON and /metrics responses are gzipped for clients that
+    # accept it.
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_MIMETYPES = {'text/html', 'text/csv', 'application/json', 'text/plain'}
+    # Static URLs are versioned by file modification time (serving.py), so
+    # browsers can keep the files for a year.
+    SEND_FILE_MAX_AGE_DEFAULT = int(os.environ.get('STATIC_MAX_AGE', 365 * 24 * 3600))
+    # Number of reverse proxies in front of the app. Their X-Forwarded-For,
+    # -Proto and -Host headers are trusted, so request.remote_addr is the
+    # client's address rather than the proxy's. 0 = not proxied.
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 0))
     
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
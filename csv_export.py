@@ -0,0 +1,92 @@
+import csv
+from io import StringIO
+from sqlalchemy import select
+from models import db, Purchase, Category, User
+from money import format_amounts
+
+EXPORT_HEADER = [
+    'ID', 'Date', 'Description', 'Vendor', 'Type', 'Category',
+    'Quantity', 'Amount', 'Total', 'Currency', 'Paid on Collection', 'Notes', 'Uploaded By'
+]
+
+def _export_statement(purchase_filter, entity):
+    return select(
+        entity.id,
+        entity.date_collected,
+        entity.description,
+        entity.vendor,
+        entity.purchase_type,
+        Category.name,
+        entity.quantity,
+        entity.amount_minor,
+        (entity.amount_minor * entity.quantity).label('total_minor'),
+        entity.currency,
+        entity.paid_on_collection,
+        entity.notes,
+        User.username
+    ).select_from(entity).outerjoin(
+        Category, entity.category_id == Category.id
+    ).join(
+        User, entity.user_id == User.id
+    ).where(
+        *purchase_filter.conditions(entity)
+    ).order_by(
+        entity.date_collected.desc(),
+        entity.id.desc()
+    )
+
+def export_statement(purchase_filter, entity=Purchase):
+    return purchase_filter.statement(('export', entity), lambda f: _export_statement(f, entity))
+
+def export_rows(purchase_filter, batch_size=1000, entity=Purchase):
+    # Plain column rows from one joined query; yield_per keeps only a batch
+    # of rows in memory instead of building ORM objects for the whole export.
+    return db.session.execute(
+        export_statement(purchase_filter, entity),
+        purchase_filter.params,
+        execution_options={'yield_per': batch_size}
+    )
+
+def format_rows(rows):
+    # A batch at a time: totals already come from SQL as integers, and the
+    # money columns are formatted in one pass per column rather than per row.
+    currencies = [row.currency for row in rows]
+    amounts = format_amounts([row.amount_minor for row in rows], currencies)
+    totals = format_amounts([row.total_minor for row in rows], currencies)
+    return [
+        [
+            row.id,
+            row.date_collected,
+            row.description,
+            row.vendor,
+            row.purchase_type,
+            row.name or 'N/A',
+            row.quantity,
+            amount,
+            total,
+            row.currency,
+            'Yes' if row.paid_on_collection else 'No',
+            row.notes or '',
+            row.username
+        ]
+        for row, amount, total in zip(rows, amounts, totals)
+    ]
+
+def iter_purchase_csv(purchase_filter, batch_size=1000, entity=Purchase):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+    
+    writer.writerow(EXPORT_HEADER)
+    yield flush()
+    
+    # With yield_per set, partitions() hands over the rows one fetched batch
+    # at a time.
+    for rows in export_rows(purchase_filter, batch_size, entity).partitions():
+        writer.writerows(format_rows(rows))
+        yield flush()
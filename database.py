@@ -0,0 +1,77 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models import db
+from replica import READ_BIND, read_database_uri
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE'),
+    ('cache_size', 'SQLITE_CACHE_SIZE'),
+)
+
+def normalize_database_uri(uri):
+    # Hosting providers hand out postgres:// URLs, which SQLAlchemy rejects,
+    # and a bare postgresql:// would pick psycopg2; use psycopg 3 for both.
+    for scheme in ('postgres://', 'postgresql://'):
+        if uri.startswith(scheme):
+            return 'postgresql+psycopg://' + uri[len(scheme):]
+    return uri
+
+def engine_options(config):
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # In-memory databases live in a single connection; no pool to tune.
+        return {}
+    
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        # Server connections can be dropped underneath the pool.
+        options['pool_pre_ping'] = True
+    return options
+
+def sqlite_pragmas(config):
+    return [(pragma, config[key]) for pragma, key in SQLITE_PRAGMAS if config.get(key) is not None]
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in pragmas:
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+    finally:
+        cursor.close()
+
+def install_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+def init_database(app):
+    config = app.config
+    config['SQLALCHEMY_DATABASE_URI'] = normalize_database_uri(config['SQLALCHEMY_DATABASE_URI'])
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS win over the DB_POOL_* settings.
+    if not config.get('SQLALCHEMY_ENGINE_OPTIONS'):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config)
+    
+    read_uri = read_database_uri(config)
+    if read_uri:
+        config.setdefault('SQLALCHEMY_BINDS', {})[READ_BIND] = normalize_database_uri(read_uri)
+    
+    db.init_app(app)
+    
+    with app.app_context():
+        engines = dict(db.engines)
+    pragmas = sqlite_pragmas(config)
+    if engines[None].dialect.name == 'sqlite':
+        install_pragmas(engines[None], pragmas)
+    if READ_BIND in engines and engines[READ_BIND].dialect.name == 'sqlite':
+        # The journal mode belongs to the database file and is set by the
+        # primary; a read-only connection can't change it.
+        read_pragmas = [(pragma, value) for pragma, value in pragmas if pragma != 'journal_mode']
+        install_pragmas(engines[READ_BIND], read_pragmas + [('query_only', 1)])
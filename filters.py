@@ -0,0 +1,165 @@
+from copy import copy
+from datetime import datetime
+from sqlalchemy import bindparam, func, select, String
+from models import db, Purchase
+from search import search_available, match_expression, match_condition
+from money import is_currency_code
+
+FILTER_PARAMS = ('search', 'category', 'vendor', 'type', 'date_from', 'date_to', 'currency')
+PURCHASE_TYPES = ('product', 'service')
+
+# Statements built for one combination of active filters, shared by every
+# request with that combination; see PurchaseFilter.statement().
+_statements = {}
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+class PurchaseFilter:
+    # The dashboard filters, parsed and validated once. Each active filter
+    # becomes a condition on a bind parameter rather than a literal, so two
+    # requests that filter on the same fields produce the same statement:
+    # it's built once, and SQLAlchemy's compiled cache reuses its SQL.
+    
+    def __init__(self, search=None, category_id=None, vendor=None, purchase_type=None, date_from=None, date_to=None, currency=None):
+        self.search = search or None
+        self.category_id = category_id
+        self.vendor = vendor or None
+        self.purchase_type = purchase_type or None
+        self.date_from = date_from
+        self.date_to = date_to
+        self.currency = currency or None
+        self.args = {}
+        self.errors = {}
+    
+    @classmethod
+    def from_args(cls, args):
+        # Invalid values are reported in .errors and left out of the filter;
+        # .args keeps the submitted strings for the filter form.
+        raw = {name: args.get(name, '').strip() for name in FILTER_PARAMS}
+        errors = {}
+        
+        category_id = None
+        if raw['category']:
+            try:
+                category_id = int(raw['category'])
+            except ValueError:
+                errors['category'] = 'Category must be a category id.'
+        
+        purchase_type = raw['type'] or None
+        if purchase_type and purchase_type not in PURCHASE_TYPES:
+            errors['type'] = f"Type must be one of: {', '.join(PURCHASE_TYPES)}."
+            purchase_type = None
+        
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            dates[name] = _parse_date(raw[name]) if raw[name] else None
+            if raw[name] and dates[name] is None:
+                errors[name] = f'{name} must be a date in YYYY-MM-DD format.'
+        if dates['date_from'] and dates['date_to'] and dates['date_from'] > dates['date_to']:
+            errors['date_to'] = 'date_to must not be before date_from.'
+            dates['date_to'] = None
+        
+        currency = raw['currency'].upper() or None
+        if currency and not is_currency_code(currency):
+            errors['currency'] = 'Currency must be a three-letter ISO 4217 code.'
+            currency = None
+        
+        purchase_filter = cls(
+            search=raw['search'],
+            category_id=category_id,
+            vendor=raw['vendor'],
+            purchase_type=purchase_type,
+            currency=currency,
+            **dates
+        )
+        purchase_filter.args = raw
+        purchase_filter.errors = errors
+        return purchase_filter
+    
+    @property
+    def criteria(self):
+        values = {
+            'search': self.search,
+            'category_id': self.category_id,
+            'vendor': self.vendor,
+            'purchase_type': self.purchase_type,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'currency': self.currency,
+        }
+        return {name: value for name, value in values.items() if value is not None}
+    
+    def in_currency(self, currency):
+        # Totals only add up within one currency: aggregates report in the
+        # filtered currency, or in this one when the filter leaves it open.
+        if self.currency:
+            return self
+        reporting = copy(self)
+        reporting.currency = currency
+        return reporting
+    
+    def _full_text(self):
+        return bool(self.search and search_available() and match_expression(self.search))
+    
+    @property
+    def shape(self):
+        # Which filters are active (and how search is answered), not their
+        # values: everything that changes the SQL.
+        return tuple(sorted(self.criteria)), self._full_text()
+    
+    @property
+    def params(self):
+        params = self.criteria
+        if self._full_text():
+            params['search_match'] = match_expression(self.search)
+        return params
+    
+    def conditions(self, entity=Purchase, day=None):
+        # `day` stands in for date_collected on sources that name it
+        # differently, like the rollups.
+        day = entity.date_collected if day is None else day
+        conditions = []
+        if self.search:
+            if entity is Purchase and self._full_text():
+                conditions.append(match_condition(bindparam('search_match', type_=String)))
+            else:
+                # The full-text index only covers the purchases table itself.
+                search = bindparam('search', type_=String)
+                conditions.append(entity.description.contains(search) | entity.vendor.contains(search))
+        if self.category_id is not None:
+            conditions.append(entity.category_id == bindparam('category_id'))
+        if self.vendor:
+            conditions.append(entity.vendor == bindparam('vendor'))
+        if self.purchase_type:
+            conditions.append(entity.purchase_type == bindparam('purchase_type'))
+        if self.date_from:
+            conditions.append(day >= bindparam('date_from'))
+        if self.date_to:
+            conditions.append(day <= bindparam('date_to'))
+        if self.currency:
+            conditions.append(entity.currency == bindparam('currency'))
+        return conditions
+    
+    def apply(self, query, entity=Purchase):
+        # For ORM queries that go on to add options, ordering or paging.
+        return query.filter(*self.conditions(entity)).params(self.params)
+    
+    def statement(self, name, build):
+        # build(self) runs once per name and filter shape; execute the result
+        # with self.params plus whatever parameters the caller added.
+        key = (name, db.engine.dialect.name, self.shape)
+        stmt = _statements.get(key)
+        if stmt is None:
+            stmt = _statements[key] = build(self)
+        return stmt
+    
+    def select(self, *columns, entity=Purchase):
+        return select(*columns).select_from(entity).where(*self.conditions(entity))
+    
+    def count(self):
+        stmt = self.statement('count', lambda f: f.select(func.count(Purchase.id)))
+        return db.session.execute(stmt, self.params).scalar()
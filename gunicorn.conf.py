@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+
+# Worker processes, each with a pool of request threads. Threads suit this
+# app: most request time is spent waiting on the database or the client.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# create_app() runs once in the master, and the workers fork from it with
+# the app already imported and configured.
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers after this many requests (0 = never), with jitter so they
+# don't all restart at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+# Only covers the scheme; set PROXY_COUNT as well so the app sees the
+# client's address rather than the proxy's.
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+def post_fork(server, worker):
+    # create_app() doesn't open connections, but anything the master did
+    # open must not be shared with the workers.
+    from wsgi import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def worker_exit(server, worker):
+    # Write the worker's buffered audit events before it goes away.
+    from wsgi import app
+    app.extensions['audit_writer'].flush()
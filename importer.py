@@ -0,0 +1,214 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Category, User, Purchase
+from rollups import record_purchase_rows
+from audit import audit_row, write_audit_rows
+from money import parse_amount, minor_digits, is_currency_code
+from filters import PURCHASE_TYPES
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+    
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+    
+    @property
+    def failed(self):
+        return len(self.errors)
+
+def _text_lines(stream):
+    # Decoded a line at a time rather than in large chunks, so a bad byte
+    # stops the import at the line that holds it instead of before the first
+    # row. Splitting on b'\n' is safe: it never occurs inside a UTF-8 sequence.
+    if isinstance(stream, io.TextIOBase):
+        yield from stream
+        return
+    encoding = 'utf-8-sig'
+    for line in stream:
+        yield line.decode(encoding)
+        encoding = 'utf-8'
+
+def iter_csv_records(stream):
+    reader = csv.DictReader(_text_lines(stream))
+    for row_number, record in enumerate(reader, start=2):
+        yield row_number, record
+
+def iter_json_records(stream):
+    # A JSON array has to be parsed whole; JSON Lines (one object per line)
+    # is read one record at a time for large imports, numbered by line.
+    lines = _text_lines(stream)
+    started = False
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        if not started and line.lstrip().startswith('['):
+            for row_number, record in enumerate(json.loads(line + ''.join(lines)), start=1):
+                yield row_number, record
+            return
+        started = True
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f'Invalid JSON: {e}')
+
+def iter_records(stream, fmt):
+    if fmt == 'csv':
+        return iter_csv_records(stream)
+    if fmt in ('json', 'jsonl'):
+        return iter_json_records(stream)
+    raise ValueError(f'Unsupported import format: {fmt}')
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return 'json' if extension in ('json', 'jsonl') else 'csv'
+
+def parse_record(record, categories, users, default_user_id, default_currency='USD'):
+    # Accepts the column names export() writes, so an export file can be
+    # imported back as-is. ID and Total are derived and ignored; rows without
+    # a Currency are in the default currency.
+    if not isinstance(record, dict):
+        raise ValueError('Record must be an object.')
+    
+    def field(name):
+        value = record.get(name)
+        return '' if value is None else str(value).strip()
+    
+    description = field('Description')
+    vendor = field('Vendor')
+    date_collected = field('Date')
+    amount = field('Amount')
+    if not description or not amount or not vendor or not date_collected:
+        raise ValueError('Description, amount, vendor, and date are required.')
+    
+    currency = field('Currency').upper() or default_currency
+    if not is_currency_code(currency):
+        raise ValueError(f'Unknown currency: {currency}')
+    
+    try:
+        amount_minor = parse_amount(amount, currency)
+        if amount_minor <= 0:
+            raise ValueError()
+    except ValueError:
+        raise ValueError(f'Amount must be a positive number with at most {minor_digits(currency)} decimal places.')
+    
+    try:
+        quantity = int(field('Quantity') or 1)
+        if quantity <= 0:
+            raise ValueError()
+    except ValueError:
+        raise ValueError('Quantity must be a positive integer.')
+    
+    try:
+        date_obj = datetime.strptime(date_collected, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Invalid date format.')
+    
+    purchase_type = field('Type') or 'product'
+    if purchase_type not in PURCHASE_TYPES:
+        raise ValueError(f'Unknown purchase type: {purchase_type}')
+    
+    category_name = field('Category')
+    category_id = None
+    if category_name and category_name != 'N/A':
+        if category_name not in categories:
+            raise ValueError(f'Unknown category: {category_name}')
+        category_id = categories[category_name]
+    
+    username = field('Uploaded By')
+    user_id = default_user_id
+    if username:
+        if username not in users:
+            raise ValueError(f'Unknown user: {username}')
+        user_id = users[username]
+    
+    paid = field('Paid on Collection').lower()
+    
+    return {
+        'user_id': user_id,
+        'description': description,
+        'amount_minor': amount_minor,
+        'currency': currency,
+        'quantity': quantity,
+        'vendor': vendor,
+        'date_collected': date_obj,
+        'purchase_type': purchase_type,
+        'category_id': category_id,
+        'notes': field('Notes'),
+        'paid_on_collection': 0 if paid in ('no', 'false', '0') else 1
+    }
+
+def _audit_row(purchase_id, values, importer_id):
+    audit_data = dict(values)
+    del audit_data['user_id']
+    return audit_row(purchase_id, importer_id, 'import', audit_data)
+
+def _insert_rows(rows, importer_id):
+    purchase_ids = db.session.execute(
+        insert(Purchase).returning(Purchase.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+    # Imports already write in batches, so their audit rows go in the same
+    # transaction rather than through the buffered writer.
+    write_audit_rows([_audit_row(purchase_id, values, importer_id) for purchase_id, values in zip(purchase_ids, rows)])
+    record_purchase_rows(rows)
+
+def _write_batch(batch, importer_id, report):
+    try:
+        with db.session.begin_nested():
+            _insert_rows([values for _, values in batch], importer_id)
+        report.imported += len(batch)
+    except SQLAlchemyError:
+        # Something in the batch was rejected by the database; retry row by
+        # row so only the offending rows are reported and skipped.
+        for row_number, values in batch:
+            try:
+                with db.session.begin_nested():
+                    _insert_rows([values], importer_id)
+                report.imported += 1
+            except SQLAlchemyError as e:
+                report.add_error(row_number, str(getattr(e, 'orig', e)))
+    db.session.commit()
+
+def import_purchases(stream, fmt, importer, batch_size=500, currency='USD'):
+    report = ImportReport()
+    importer_id = importer.id
+    categories = dict(db.session.query(Category.name, Category.id).all())
+    users = dict(db.session.query(User.username, User.id).all())
+    
+    records = iter_records(stream, fmt)
+    batch = []
+    row_number = 0
+    while True:
+        # A decoding or CSV syntax error comes from the reader itself and
+        # ends it; earlier batches are already committed, so the rows read so
+        # far are written and the error is reported against the next row.
+        try:
+            row_number, record = next(records)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:
+            report.add_error(row_number + 1, f'Could not read the file any further: {e}')
+            break
+        
+        try:
+            if isinstance(record, Exception):
+                raise record
+            batch.append((row_number, parse_record(record, categories, users, importer_id, currency)))
+        except ValueError as e:
+            report.add_error(row_number, str(e))
+            continue
+        
+        if len(batch) >= batch_size:
+            _write_batch(batch, importer_id, report)
+            batch = []
+    
+    if batch:
+        _write_batch(batch, importer_id, report)
+    
+    return report
@@ -0,0 +1,247 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+    
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+class RequestStats:
+    # What one request spent in the database. Kept on `g`; statements are
+    # counted by their SQL text, which has the parameters already factored
+    # out, so the same lookup run once per row shows up as one entry.
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+    
+    def record_query(self, statement, duration):
+        self.query_count += 1
+        self.query_time += duration
+        self.statements[statement] += 1
+    
+    def repeated(self, threshold):
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+def _short(statement, limit=300):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+class Metrics:
+    def __init__(self, slow_query_threshold=0.25, n_plus_one_threshold=10, recent=50):
+        self.slow_query_threshold = slow_query_threshold
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.requests = Counter()
+        self.request_durations = {}
+        self.request_queries = Counter()
+        self.query_durations = Histogram()
+        self.slow_query_count = 0
+        self.n_plus_one = Counter()
+        self.recent_requests = deque(maxlen=recent)
+        self.slow_queries = deque(maxlen=recent)
+        self._lock = threading.Lock()
+    
+    def record_query(self, statement, duration):
+        stats = g.get('request_stats') if has_app_context() else None
+        if stats is not None:
+            stats.record_query(statement, duration)
+        
+        slow = duration >= self.slow_query_threshold
+        with self._lock:
+            self.query_durations.observe(duration)
+            if slow:
+                self.slow_query_count += 1
+                self.slow_queries.appendleft({
+                    'statement': _short(statement),
+                    'duration_ms': duration * 1000,
+                    'endpoint': request.endpoint if has_request_context() else None,
+                })
+        if slow:
+            logger.warning('Slow query (%.1f ms): %s', duration * 1000, _short(statement, 1000))
+    
+    def record_request(self, endpoint, method, path, status, stats):
+        duration = time.perf_counter() - stats.started
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        for statement, count in repeated:
+            logger.warning('Possible N+1 on %s: statement ran %d times: %s', endpoint, count, _short(statement))
+        
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.request_durations.setdefault(endpoint, Histogram()).observe(duration)
+            self.request_queries[endpoint] += stats.query_count
+            if repeated:
+                self.n_plus_one[endpoint] += 1
+            self.recent_requests.appendleft({
+                'method': method,
+                'path': path,
+                'endpoint': endpoint,
+                'status': status,
+                'duration_ms': duration * 1000,
+                'query_count': stats.query_count,
+                'query_ms': stats.query_time * 1000,
+                'repeated': [(_short(statement), count) for statement, count in repeated],
+            })
+        return duration
+    
+    def snapshot(self):
+        with self._lock:
+            endpoints = [
+                {
+                    'endpoint': endpoint,
+                    'count': histogram.count,
+                    'avg_ms': histogram.sum / histogram.count * 1000,
+                    'max_ms': histogram.max * 1000,
+                    'avg_queries': self.request_queries[endpoint] / histogram.count,
+                    'n_plus_one': self.n_plus_one[endpoint],
+                }
+                for endpoint, histogram in self.request_durations.items()
+            ]
+            return {
+                'endpoints': sorted(endpoints, key=lambda row: row['avg_ms'] * row['count'], reverse=True),
+                'recent_requests': list(self.recent_requests),
+                'slow_queries': list(self.slow_queries),
+                'query_count': self.query_durations.count,
+                'query_ms': self.query_durations.sum * 1000,
+                'slow_query_count': self.slow_query_count,
+                'slow_query_threshold_ms': self.slow_query_threshold * 1000,
+            }
+    
+    def _histogram_lines(self, name, histogram, **labels):
+        for bound, total in histogram.cumulative():
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f'{name}_bucket{_labels(**labels, le=le)} {total}'
+        suffix = _labels(**labels) if labels else ''
+        yield f'{name}_sum{suffix} {histogram.sum}'
+        yield f'{name}_count{suffix} {histogram.count}'
+    
+    def render(self, extra=None):
+        # Prometheus text exposition format, version 0.0.4.
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP expendiforge_requests_total HTTP requests by endpoint, method and status.',
+                '# TYPE expendiforge_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'expendiforge_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+            
+            lines += [
+                '# HELP expendiforge_request_duration_seconds Request handling time by endpoint.',
+                '# TYPE expendiforge_request_duration_seconds histogram',
+            ]
+            for endpoint, histogram in sorted(self.request_durations.items()):
+                lines += self._histogram_lines('expendiforge_request_duration_seconds', histogram, endpoint=endpoint)
+            
+            lines += [
+                '# HELP expendiforge_request_queries_total Database queries run by requests, by endpoint.',
+                '# TYPE expendiforge_request_queries_total counter',
+            ]
+            for endpoint, count in sorted(self.request_queries.items()):
+                lines.append(f'expendiforge_request_queries_total{_labels(endpoint=endpoint)} {count}')
+            
+            lines += [
+                '# HELP expendiforge_n_plus_one_requests_total Requests that ran one statement at least N_PLUS_ONE_THRESHOLD times.',
+                '# TYPE expendiforge_n_plus_one_requests_total counter',
+            ]
+            for endpoint, count in sorted(self.n_plus_one.items()):
+                lines.append(f'expendiforge_n_plus_one_requests_total{_labels(endpoint=endpoint)} {count}')
+            
+            lines += [
+                '# HELP expendiforge_db_query_duration_seconds Database query time, all queries.',
+                '# TYPE expendiforge_db_query_duration_seconds histogram',
+            ]
+            lines += self._histogram_lines('expendiforge_db_query_duration_seconds', self.query_durations)
+            
+            lines += [
+                '# HELP expendiforge_db_slow_queries_total Queries slower than SLOW_QUERY_THRESHOLD.',
+                '# TYPE expendiforge_db_slow_queries_total counter',
+                f'expendiforge_db_slow_queries_total {self.slow_query_count}',
+            ]
+        
+        for name, kind, help_text, value in extra or ():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+def _install_query_hooks(engine, metrics):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _end_query(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        metrics.record_query(statement, time.perf_counter() - started)
+    
+    @event.listens_for(engine, 'handle_error')
+    def _fail_query(context):
+        # A failed statement never reaches after_cursor_execute.
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
+
+def init_metrics(app):
+    metrics = app.extensions['metrics'] = Metrics(
+        slow_query_threshold=app.config['SLOW_QUERY_THRESHOLD'],
+        n_plus_one_threshold=app.config['N_PLUS_ONE_THRESHOLD'],
+        recent=app.config['METRICS_RECENT_REQUESTS']
+    )
+    if not app.config['METRICS_ENABLED']:
+        return
+    
+    with app.app_context():
+        for engine in set(db.engines.values()):
+            _install_query_hooks(engine, metrics)
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_stats = RequestStats()
+    
+    @app.after_request
+    def record_request_timing(response):
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return response
+        # Streamed responses (the CSV export) are timed up to the first
+        # byte; the rows they fetch afterwards still count as queries.
+        duration = metrics.record_request(
+            request.endpoint or 'unmatched', request.method, request.path, response.status_code, stats
+        )
+        response.headers['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, db;dur={stats.query_time * 1000:.1f};desc="{stats.query_count} queries"'
+        )
+        return response
+
+def get_metrics():
+    return current_app.extensions['metrics']
@@ -0,0 +1,49 @@
+"""purchase query indexes
+
+Revision ID: 0f701ed1d147
+Revises: 
+Create Date: 2026-10-18 15:36:41.303119
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0f701ed1d147'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Databases created by db.create_all() already have these indexes, so every
+# create/drop is guarded and the migration is safe to run against either.
+# spend_rollups may not exist yet; a7d3f9c2e6b4 creates it with its indexes.
+INDEXES = [
+    ('purchases', 'ix_purchases_date_collected_id', ['date_collected', 'id']),
+    ('purchases', 'ix_purchases_category_date', ['category_id', 'date_collected', 'id']),
+    ('purchases', 'ix_purchases_vendor_date', ['vendor', 'date_collected', 'id']),
+    ('purchases', 'ix_purchases_type_date', ['purchase_type', 'date_collected', 'id']),
+    ('purchases', 'ix_purchases_user_date', ['user_id', 'date_collected']),
+    ('audit_logs', 'ix_audit_logs_purchase_id', ['purchase_id']),
+    ('audit_logs', 'ix_audit_logs_user_id', ['user_id']),
+    ('spend_rollups', 'ix_spend_rollups_group', ['day', 'category_id', 'vendor', 'purchase_type']),
+    ('spend_rollups', 'ix_spend_rollups_category_day', ['category_id', 'day']),
+    ('spend_rollups', 'ix_spend_rollups_vendor_day', ['vendor', 'day']),
+    ('spend_rollups', 'ix_spend_rollups_type_day', ['purchase_type', 'day']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, name, columns in INDEXES:
+        if not inspector.has_table(table):
+            continue
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, name, columns in reversed(INDEXES):
+        if not inspector.has_table(table):
+            continue
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,26 @@
+"""audit log history index
+
+Revision ID: 3d8b1f5a7c92
+Revises: 9a4f6c2e8b17
+Create Date: 2026-10-18 19:12:40.518263
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8b1f5a7c92'
+down_revision = '9a4f6c2e8b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The composite index also serves lookups by purchase_id alone.
+    op.create_index('ix_audit_logs_purchase_timestamp', 'audit_logs', ['purchase_id', 'timestamp'], unique=False, if_not_exists=True)
+    op.drop_index('ix_audit_logs_purchase_id', table_name='audit_logs', if_exists=True)
+
+
+def downgrade():
+    op.create_index('ix_audit_logs_purchase_id', 'audit_logs', ['purchase_id'], unique=False, if_not_exists=True)
+    op.drop_index('ix_audit_logs_purchase_timestamp', table_name='audit_logs', if_exists=True)
@@ -0,0 +1,58 @@
+"""attachment processing
+
+Revision ID: 5c3e8a91d2f4
+Revises: b7e2d9c41a53
+Create Date: 2026-10-18 16:40:52.907311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c3e8a91d2f4'
+down_revision = 'b7e2d9c41a53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table('attachments'):
+        op.create_table(
+            'attachments',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('original_filename', sa.String(length=255), nullable=True),
+            sa.Column('content_type', sa.String(length=100), nullable=True),
+            sa.Column('size', sa.Integer(), nullable=True),
+            sa.Column('sha256', sa.String(length=64), nullable=True),
+            sa.Column('thumbnail_filename', sa.String(length=255), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('processed_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_attachments_status', 'attachments', ['status'], unique=False)
+
+    # A plain ADD COLUMN rather than a batch table rebuild: rebuilding
+    # purchases on SQLite would silently drop the full-text search triggers.
+    # SQLite can't add the foreign key afterwards, and doesn't enforce it by
+    # default, so the constraint is only created on other databases.
+    columns = [column['name'] for column in inspector.get_columns('purchases')]
+    if 'attachment_id' not in columns:
+        op.add_column('purchases', sa.Column('attachment_id', sa.Integer(), nullable=True))
+        if bind.dialect.name != 'sqlite':
+            op.create_foreign_key('fk_purchases_attachment_id', 'purchases', 'attachments', ['attachment_id'], ['id'])
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('fk_purchases_attachment_id', 'purchases', type_='foreignkey')
+    op.drop_column('purchases', 'attachment_id')
+
+    op.drop_index('ix_attachments_status', table_name='attachments')
+    op.drop_table('attachments')
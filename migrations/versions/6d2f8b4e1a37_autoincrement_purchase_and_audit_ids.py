@@ -0,0 +1,112 @@
+"""autoincrement purchase and audit ids
+
+Revision ID: 6d2f8b4e1a37
+Revises: e1c4a7f3b958
+Create Date: 2026-10-18 21:47:12.803644
+
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2f8b4e1a37'
+down_revision = 'e1c4a7f3b958'
+branch_labels = None
+depends_on = None
+
+HISTORY_VIEW = 'purchases_history'
+ARCHIVES = {
+    'purchases': re.compile(r'^purchases_archive_(\d{4})$'),
+    'audit_logs': re.compile(r'^audit_logs_archive_(\d{4})$'),
+}
+
+# Same triggers as b7e2d9c41a53; a batch rebuild of purchases drops them.
+FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_insert AFTER INSERT ON purchases BEGIN
+        INSERT INTO purchases_fts(rowid, description, vendor, notes)
+        VALUES (new.id, new.description, new.vendor, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_delete AFTER DELETE ON purchases BEGIN
+        INSERT INTO purchases_fts(purchases_fts, rowid, description, vendor, notes)
+        VALUES ('delete', old.id, old.description, old.vendor, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_update AFTER UPDATE OF description, vendor, notes ON purchases BEGIN
+        INSERT INTO purchases_fts(purchases_fts, rowid, description, vendor, notes)
+        VALUES ('delete', old.id, old.description, old.vendor, old.notes);
+        INSERT INTO purchases_fts(rowid, description, vendor, notes)
+        VALUES (new.id, new.description, new.vendor, new.notes);
+    END""",
+]
+
+
+def _table_sql(bind, table):
+    return bind.execute(sa.text('SELECT sql FROM sqlite_master WHERE name = :name'), {'name': table}).scalar() or ''
+
+
+def _restore_fts_triggers(bind):
+    exists = bind.execute(sa.text("SELECT 1 FROM sqlite_master WHERE name = 'purchases_fts'")).first()
+    if exists:
+        for statement in FTS_TRIGGERS:
+            op.execute(statement)
+
+
+def _create_history_view(bind, archives):
+    # Mirrors archive.refresh_history_view(); columns are matched by name.
+    columns = ', '.join(column['name'] for column in sa.inspect(bind).get_columns('purchases'))
+    parts = [f'SELECT {columns} FROM {name}' for name in ['purchases'] + archives]
+    op.execute(f"CREATE VIEW {HISTORY_VIEW} AS {' UNION ALL '.join(parts)}")
+
+
+def _rebuild(table, autoincrement):
+    with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+
+
+def _seed_sequence(bind, table, archives):
+    # Ids already handed out may only survive in an archive table, so the
+    # sequence starts past the highest id anywhere.
+    highest = max(
+        bind.execute(sa.text(f'SELECT coalesce(max(id), 0) FROM {name}')).scalar()
+        for name in [table] + archives
+    )
+    op.execute(sa.text('DELETE FROM sqlite_sequence WHERE name = :name').bindparams(name=table))
+    op.execute(sa.text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)').bindparams(name=table, seq=highest))
+
+
+def _convert(autoincrement):
+    # Only SQLite reuses the highest deleted rowid; sequences elsewhere
+    # never go back. Each table is checked on its own, so tables create_all()
+    # made with AUTOINCREMENT, or a rerun after a failure, are left as they are.
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    inspector = sa.inspect(bind)
+    names = inspector.get_table_names()
+    had_view = HISTORY_VIEW in inspector.get_view_names()
+    archives = {
+        table: sorted(name for name in names if pattern.match(name))
+        for table, pattern in ARCHIVES.items()
+    }
+
+    # The view reads purchases and would block the rebuild.
+    op.execute(f'DROP VIEW IF EXISTS {HISTORY_VIEW}')
+    for table in ARCHIVES:
+        if ('AUTOINCREMENT' in _table_sql(bind, table).upper()) == autoincrement:
+            continue
+        _rebuild(table, autoincrement)
+        if autoincrement:
+            _seed_sequence(bind, table, archives[table])
+    _restore_fts_triggers(bind)
+
+    if had_view or archives['purchases']:
+        _create_history_view(bind, archives['purchases'])
+
+
+def upgrade():
+    _convert(True)
+
+
+def downgrade():
+    _convert(False)
@@ -0,0 +1,35 @@
+"""throttle counters
+
+Revision ID: 8e5b1c7d4f20
+Revises: c4a9e2f7b3d1
+Create Date: 2026-10-18 22:52:06.117384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e5b1c7d4f20'
+down_revision = 'c4a9e2f7b3d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('throttle_counters'):
+        return
+
+    op.create_table(
+        'throttle_counters',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_throttle_counters_expires_at', 'throttle_counters', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_throttle_counters_expires_at', table_name='throttle_counters')
+    op.drop_table('throttle_counters')
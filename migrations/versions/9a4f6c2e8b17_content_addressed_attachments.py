@@ -0,0 +1,37 @@
+"""content addressed attachments
+
+Revision ID: 9a4f6c2e8b17
+Revises: 5c3e8a91d2f4
+Create Date: 2026-10-18 18:05:13.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f6c2e8b17'
+down_revision = '5c3e8a91d2f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('stored_blobs'):
+        return
+
+    op.create_table(
+        'stored_blobs',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_stored_blobs_ref_count', 'stored_blobs', ['ref_count'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stored_blobs_ref_count', table_name='stored_blobs')
+    op.drop_table('stored_blobs')
@@ -0,0 +1,63 @@
+"""spend rollups
+
+Revision ID: a7d3f9c2e6b4
+Revises: 8e5b1c7d4f20
+Create Date: 2026-10-19 09:12:44.631058
+
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3f9c2e6b4'
+down_revision = '8e5b1c7d4f20'
+branch_labels = None
+depends_on = None
+
+ARCHIVE_PATTERN = re.compile(r'^purchases_archive_(\d{4})$')
+GROUP_COLUMNS = 'date_collected, category_id, vendor, purchase_type, currency'
+
+
+def upgrade():
+    # spend_rollups used to come only from create_all() in init-db, so a
+    # database kept current with `db upgrade` alone never got it.
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('spend_rollups'):
+        return
+
+    op.create_table(
+        'spend_rollups',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('vendor', sa.String(length=100), nullable=False),
+        sa.Column('purchase_type', sa.String(length=20), nullable=False),
+        sa.Column('currency', sa.String(length=3), server_default='USD', nullable=False),
+        sa.Column('purchase_count', sa.Integer(), nullable=False),
+        sa.Column('total_minor', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_spend_rollups_group', 'spend_rollups', ['day', 'category_id', 'vendor', 'purchase_type', 'currency'], unique=False)
+    op.create_index('ix_spend_rollups_category_day', 'spend_rollups', ['category_id', 'day'], unique=False)
+    op.create_index('ix_spend_rollups_vendor_day', 'spend_rollups', ['vendor', 'day'], unique=False)
+    op.create_index('ix_spend_rollups_type_day', 'spend_rollups', ['purchase_type', 'day'], unique=False)
+
+    # Same grouping as rollups.rebuild_rollups(): archived purchases still
+    # count towards every total.
+    sources = ['purchases'] + sorted(name for name in inspector.get_table_names() if ARCHIVE_PATTERN.match(name))
+    history = ' UNION ALL '.join(
+        f"SELECT date_collected, category_id, vendor, purchase_type, coalesce(currency, 'USD') AS currency, "
+        f"amount_minor * quantity AS total_minor FROM {name}"
+        for name in sources
+    )
+    op.execute(
+        'INSERT INTO spend_rollups (day, category_id, vendor, purchase_type, currency, purchase_count, total_minor) '
+        f'SELECT {GROUP_COLUMNS}, count(*), sum(total_minor) FROM ({history}) AS history GROUP BY {GROUP_COLUMNS}'
+    )
+
+
+def downgrade():
+    op.drop_table('spend_rollups')
@@ -0,0 +1,65 @@
+"""purchase full-text search
+
+Revision ID: b7e2d9c41a53
+Revises: 0f701ed1d147
+Create Date: 2026-10-18 16:02:13.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d9c41a53'
+down_revision = '0f701ed1d147'
+branch_labels = None
+depends_on = None
+
+STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS purchases_fts USING fts5(
+        description, vendor, notes,
+        content='purchases', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_insert AFTER INSERT ON purchases BEGIN
+        INSERT INTO purchases_fts(rowid, description, vendor, notes)
+        VALUES (new.id, new.description, new.vendor, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_delete AFTER DELETE ON purchases BEGIN
+        INSERT INTO purchases_fts(purchases_fts, rowid, description, vendor, notes)
+        VALUES ('delete', old.id, old.description, old.vendor, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_update AFTER UPDATE OF description, vendor, notes ON purchases BEGIN
+        INSERT INTO purchases_fts(purchases_fts, rowid, description, vendor, notes)
+        VALUES ('delete', old.id, old.description, old.vendor, old.notes);
+        INSERT INTO purchases_fts(rowid, description, vendor, notes)
+        VALUES (new.id, new.description, new.vendor, new.notes);
+    END""",
+    "INSERT INTO purchases_fts(purchases_fts) VALUES ('rebuild')",
+]
+
+
+def _fts5_available(bind):
+    if bind.dialect.name != 'sqlite':
+        return False
+    options = bind.execute(sa.text('PRAGMA compile_options')).scalars().all()
+    return 'ENABLE_FTS5' in options
+
+
+def upgrade():
+    # Full-text search is SQLite/FTS5 only; other databases keep the LIKE
+    # fallback and this revision is a no-op for them.
+    bind = op.get_bind()
+    if not _fts5_available(bind):
+        return
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    for trigger in ('purchases_fts_insert', 'purchases_fts_delete', 'purchases_fts_update'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS purchases_fts')
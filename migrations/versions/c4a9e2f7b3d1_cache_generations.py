@@ -0,0 +1,32 @@
+"""cache generations
+
+Revision ID: c4a9e2f7b3d1
+Revises: 6d2f8b4e1a37
+Create Date: 2026-10-18 22:15:38.420917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e2f7b3d1'
+down_revision = '6d2f8b4e1a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('cache_generations'):
+        return
+
+    op.create_table(
+        'cache_generations',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('generation', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_generations')
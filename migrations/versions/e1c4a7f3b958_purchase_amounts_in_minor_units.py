@@ -0,0 +1,187 @@
+"""purchase amounts in minor units
+
+Revision ID: e1c4a7f3b958
+Revises: 3d8b1f5a7c92
+Create Date: 2026-10-18 20:31:07.264519
+
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1c4a7f3b958'
+down_revision = '3d8b1f5a7c92'
+branch_labels = None
+depends_on = None
+
+HISTORY_VIEW = 'purchases_history'
+ARCHIVE_PATTERN = re.compile(r'^purchases_archive_(\d{4})$')
+
+# Same triggers as b7e2d9c41a53; a batch rebuild of purchases drops them.
+FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_insert AFTER INSERT ON purchases BEGIN
+        INSERT INTO purchases_fts(rowid, description, vendor, notes)
+        VALUES (new.id, new.description, new.vendor, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_delete AFTER DELETE ON purchases BEGIN
+        INSERT INTO purchases_fts(purchases_fts, rowid, description, vendor, notes)
+        VALUES ('delete', old.id, old.description, old.vendor, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS purchases_fts_update AFTER UPDATE OF description, vendor, notes ON purchases BEGIN
+        INSERT INTO purchases_fts(purchases_fts, rowid, description, vendor, notes)
+        VALUES ('delete', old.id, old.description, old.vendor, old.notes);
+        INSERT INTO purchases_fts(rowid, description, vendor, notes)
+        VALUES (new.id, new.description, new.vendor, new.notes);
+    END""",
+]
+
+# Every amount so far was entered and shown in dollars.
+TO_MINOR = 'CAST(ROUND({column} * 100) AS BIGINT)'
+TO_MAJOR = '{column} / 100.0'
+
+
+def _archive_tables(inspector):
+    return sorted(name for name in inspector.get_table_names() if ARCHIVE_PATTERN.match(name))
+
+
+def _restore_fts_triggers(bind):
+    # The rebuilt table keeps every id, so the external-content index itself
+    # is still in step and only the triggers need to come back.
+    if bind.dialect.name != 'sqlite':
+        return
+    exists = bind.execute(sa.text("SELECT 1 FROM sqlite_master WHERE name = 'purchases_fts'")).first()
+    if exists:
+        for statement in FTS_TRIGGERS:
+            op.execute(statement)
+
+
+def _create_history_view(bind, archives):
+    # Mirrors archive.refresh_history_view(), which the app can't be imported
+    # for here; columns are matched by name.
+    columns = ', '.join(column['name'] for column in sa.inspect(bind).get_columns('purchases'))
+    parts = [f'SELECT {columns} FROM {name}' for name in ['purchases'] + archives]
+    op.execute(f"CREATE VIEW {HISTORY_VIEW} AS {' UNION ALL '.join(parts)}")
+
+
+def _columns(bind, table):
+    # A fresh inspector each time: the cached one would miss the columns
+    # added earlier in this migration.
+    return [column['name'] for column in sa.inspect(bind).get_columns(table)]
+
+
+def _add_filled_column(table, column, expression):
+    op.add_column(table, column)
+    op.execute(f'UPDATE {table} SET {column.name} = {expression}')
+
+
+def _index_columns(bind, table, name):
+    for index in sa.inspect(bind).get_indexes(table):
+        if index['name'] == name:
+            return index['column_names']
+    return None
+
+
+# SQLite runs each DDL statement on its own, so a failed run can leave any
+# of these steps done and the rest not. Every step checks the schema first,
+# which lets the migration simply be run again, and also covers tables that
+# create_all() has already made in their new shape.
+def _upgrade_purchases(bind):
+    columns = _columns(bind, 'purchases')
+    if 'amount_minor' not in columns:
+        _add_filled_column('purchases', sa.Column('amount_minor', sa.BigInteger(), nullable=True), TO_MINOR.format(column='amount'))
+    if 'currency' not in columns:
+        op.add_column('purchases', sa.Column('currency', sa.String(length=3), nullable=False, server_default='USD'))
+    if 'amount' in columns:
+        with op.batch_alter_table('purchases') as batch_op:
+            batch_op.drop_constraint('check_amount_positive', type_='check')
+            batch_op.drop_column('amount')
+            batch_op.alter_column('amount_minor', existing_type=sa.BigInteger(), nullable=False)
+            batch_op.create_check_constraint('check_amount_positive', 'amount_minor > 0')
+    _restore_fts_triggers(bind)
+
+
+def _upgrade_archive(bind, name):
+    columns = _columns(bind, name)
+    if 'amount_minor' not in columns:
+        _add_filled_column(name, sa.Column('amount_minor', sa.BigInteger(), nullable=True), TO_MINOR.format(column='amount'))
+    if 'currency' not in columns:
+        op.add_column(name, sa.Column('currency', sa.String(length=3), nullable=True, server_default='USD'))
+    if 'amount' in columns:
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.drop_column('amount')
+
+
+def _upgrade_rollups(bind):
+    columns = _columns(bind, 'spend_rollups')
+    # Rollup totals are sums of whole cents, so rounding the float sum
+    # recovers the exact value.
+    if 'total_minor' not in columns:
+        _add_filled_column('spend_rollups', sa.Column('total_minor', sa.BigInteger(), nullable=True), TO_MINOR.format(column='total'))
+    if 'currency' not in columns:
+        op.add_column('spend_rollups', sa.Column('currency', sa.String(length=3), nullable=False, server_default='USD'))
+    if 'total' in columns:
+        with op.batch_alter_table('spend_rollups') as batch_op:
+            batch_op.drop_column('total')
+            batch_op.alter_column('total_minor', existing_type=sa.BigInteger(), nullable=False)
+    if 'currency' not in (_index_columns(bind, 'spend_rollups', 'ix_spend_rollups_group') or []):
+        op.drop_index('ix_spend_rollups_group', table_name='spend_rollups', if_exists=True)
+        op.create_index('ix_spend_rollups_group', 'spend_rollups', ['day', 'category_id', 'vendor', 'purchase_type', 'currency'], unique=False)
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    archives = _archive_tables(inspector)
+    # The view reads purchases.amount; it's recreated over the new columns.
+    # It exists whenever there are archive tables, so a rerun after a failed
+    # attempt that already dropped it still brings it back.
+    has_view = HISTORY_VIEW in inspector.get_view_names() or bool(archives)
+    op.execute(f'DROP VIEW IF EXISTS {HISTORY_VIEW}')
+
+    _upgrade_purchases(bind)
+    for name in archives:
+        _upgrade_archive(bind, name)
+    if inspector.has_table('spend_rollups'):
+        _upgrade_rollups(bind)
+
+    if has_view:
+        _create_history_view(bind, archives)
+
+
+def downgrade():
+    # Lossy for anything not in a two-decimal currency: the currency column
+    # goes away and every amount is read back as cents.
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    archives = _archive_tables(inspector)
+    had_view = HISTORY_VIEW in inspector.get_view_names()
+    op.execute(f'DROP VIEW IF EXISTS {HISTORY_VIEW}')
+
+    if inspector.has_table('spend_rollups'):
+        _add_filled_column('spend_rollups', sa.Column('total', sa.Float(), nullable=True), TO_MAJOR.format(column='total_minor'))
+        op.drop_index('ix_spend_rollups_group', table_name='spend_rollups')
+        with op.batch_alter_table('spend_rollups') as batch_op:
+            batch_op.drop_column('total_minor')
+            batch_op.drop_column('currency')
+            batch_op.alter_column('total', existing_type=sa.Float(), nullable=False)
+        op.create_index('ix_spend_rollups_group', 'spend_rollups', ['day', 'category_id', 'vendor', 'purchase_type'], unique=False)
+
+    for name in archives:
+        _add_filled_column(name, sa.Column('amount', sa.Float(), nullable=True), TO_MAJOR.format(column='amount_minor'))
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.drop_column('amount_minor')
+            batch_op.drop_column('currency')
+
+    _add_filled_column('purchases', sa.Column('amount', sa.Float(), nullable=True), TO_MAJOR.format(column='amount_minor'))
+    with op.batch_alter_table('purchases') as batch_op:
+        batch_op.drop_constraint('check_amount_positive', type_='check')
+        batch_op.drop_column('amount_minor')
+        batch_op.drop_column('currency')
+        batch_op.alter_column('amount', existing_type=sa.Float(), nullable=False)
+        batch_op.create_check_constraint('check_amount_positive', 'amount > 0')
+    _restore_fts_triggers(bind)
+
+    if had_view:
+        _create_history_view(bind, archives)
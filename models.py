@@ -1,9 +1,19 @@
+from functools import lru_cache
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from replica import RoutingSession
+from money import to_major
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+@lru_cache(maxsize=8)
+def hash_parameters(method):
+    # werkzeug fills in defaults for a bare 'scrypt' or 'pbkdf2', so compare
+    # against what it actually writes rather than the configured string.
+    return generate_password_hash('', method=method).split('$', 1)[0]
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -19,11 +29,18 @@ class User(UserMixin, db.Model):
     audit_logs = db.relationship('AuditLog', backref='user', lazy=True)
     
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = generate_password_hash(
+            password,
+            method=current_app.config['PASSWORD_HASH_METHOD'],
+            salt_length=current_app.config['PASSWORD_SALT_LENGTH']
+        )
     
     def check_password(self, password):
         return check_password_hash(self.password, password)
     
+    def password_needs_rehash(self):
+        return self.password.split('$', 1)[0] != hash_parameters(current_app.config['PASSWORD_HASH_METHOD'])
+    
     def __repr__(self):
         return f'<User {self.username}>'
 
@@ -45,27 +62,99 @@ class Purchase(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     description = db.Column(db.String(255), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    # In the currency's minor unit (cents), so sums stay exact integers.
+    amount_minor = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='USD', server_default='USD')
     quantity = db.Column(db.Integer, default=1, nullable=False)
     vendor = db.Column(db.String(100), nullable=False)
     date_collected = db.Column(db.Date, nullable=False, default=lambda: datetime.utcnow().date())
     purchase_type = db.Column(db.String(20), nullable=False, default='product')
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
     attachment_url = db.Column(db.String(255))
+    attachment_id = db.Column(db.Integer, db.ForeignKey('attachments.id'))
     notes = db.Column(db.Text)
     paid_on_collection = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     audit_logs = db.relationship('AuditLog', backref='purchase', lazy=True)
+    attachment = db.relationship('Attachment', lazy=True)
     
+    # Each filter the dashboard/export offers leads one index, followed by the
+    # (date_collected, id) listing order so filtered pages never need a sort.
     __table_args__ = (
-        db.CheckConstraint('amount > 0', name='check_amount_positive'),
+        db.CheckConstraint('amount_minor > 0', name='check_amount_positive'),
         db.CheckConstraint('quantity > 0', name='check_quantity_positive'),
+        db.Index('ix_purchases_date_collected_id', 'date_collected', 'id'),
+        db.Index('ix_purchases_category_date', 'category_id', 'date_collected', 'id'),
+        db.Index('ix_purchases_vendor_date', 'vendor', 'date_collected', 'id'),
+        db.Index('ix_purchases_type_date', 'purchase_type', 'date_collected', 'id'),
+        db.Index('ix_purchases_user_date', 'user_id', 'date_collected'),
+        # Archiving deletes the newest rows too; AUTOINCREMENT keeps SQLite
+        # from handing their ids out again while the archive still has them.
+        {'sqlite_autoincrement': True},
     )
     
+    @property
+    def amount(self):
+        return to_major(self.amount_minor, self.currency)
+    
+    @property
+    def total_minor(self):
+        return self.amount_minor * self.quantity
+    
+    @property
+    def total(self):
+        return to_major(self.total_minor, self.currency)
+    
     def __repr__(self):
         return f'<Purchase {self.description}>'
 
+class Attachment(db.Model):
+    __tablename__ = 'attachments'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    filename = db.Column(db.String(255), nullable=False)
+    original_filename = db.Column(db.String(255))
+    content_type = db.Column(db.String(100))
+    size = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64))
+    thumbnail_filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_attachments_status', 'status'),
+    )
+    
+    @property
+    def url(self):
+        return f"uploads/{self.filename}"
+    
+    @property
+    def thumbnail_url(self):
+        return f"uploads/{self.thumbnail_filename}" if self.thumbnail_filename else None
+    
+    def __repr__(self):
+        return f'<Attachment {self.filename} {self.status}>'
+
+class StoredBlob(db.Model):
+    __tablename__ = 'stored_blobs'
+    
+    key = db.Column(db.String(255), primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_stored_blobs_ref_count', 'ref_count'),
+    )
+    
+    def __repr__(self):
+        return f'<StoredBlob {self.key} x{self.ref_count}>'
+
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
     
@@ -76,5 +165,61 @@ class AuditLog(db.Model):
     changes = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_audit_logs_purchase_timestamp', 'purchase_id', 'timestamp'),
+        db.Index('ix_audit_logs_user_id', 'user_id'),
+        {'sqlite_autoincrement': True},
+    )
+    
     def __repr__(self):
         return f'<AuditLog {self.action} at {self.timestamp}>'
+
+class SpendRollup(db.Model):
+    __tablename__ = 'spend_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    day = db.Column(db.Date, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
+    vendor = db.Column(db.String(100), nullable=False)
+    purchase_type = db.Column(db.String(20), nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='USD', server_default='USD')
+    purchase_count = db.Column(db.Integer, nullable=False, default=0)
+    total_minor = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    # Not unique on purpose: a NULL category never collides in a unique index,
+    # and every reader sums over the group, so a duplicate row is harmless.
+    __table_args__ = (
+        db.Index('ix_spend_rollups_group', 'day', 'category_id', 'vendor', 'purchase_type', 'currency'),
+        db.Index('ix_spend_rollups_category_day', 'category_id', 'day'),
+        db.Index('ix_spend_rollups_vendor_day', 'vendor', 'day'),
+        db.Index('ix_spend_rollups_type_day', 'purchase_type', 'day'),
+    )
+    
+    def __repr__(self):
+        return f'<SpendRollup {self.day} {self.vendor} {self.total_minor} {self.currency}>'
+
+class CacheGeneration(db.Model):
+    __tablename__ = 'cache_generations'
+    
+    # One counter per cache, bumped by every write that invalidates it, so
+    # each worker process can tell its in-memory copy is out of date.
+    name = db.Column(db.String(50), primary_key=True)
+    generation = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CacheGeneration {self.name} {self.generation}>'
+
+class ThrottleCounter(db.Model):
+    __tablename__ = 'throttle_counters'
+    
+    key = db.Column(db.String(255), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    # Unix time, so every process agrees on when a window ends.
+    expires_at = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_throttle_counters_expires_at', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f'<ThrottleCounter {self.key} {self.count}>'
@@ -0,0 +1,81 @@
+import re
+from decimal import Decimal
+from functools import lru_cache
+
+CURRENCY_CODE = re.compile(r'^[A-Z]{3}$')
+AMOUNT = re.compile(r'^([0-9]+)(?:\.([0-9]+))?$')
+THOUSANDS = re.compile(r'^[0-9]{1,3}(,[0-9]{3})+(\.[0-9]+)?$')
+# Largest value a BigInteger column holds.
+MAX_MINOR = 2 ** 63 - 1
+
+# ISO 4217 currencies that don't use two decimal places.
+MINOR_UNIT_DIGITS = {
+    'JPY': 0, 'KRW': 0, 'VND': 0, 'CLP': 0, 'ISK': 0, 'UGX': 0, 'XAF': 0, 'XOF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+}
+SYMBOLS = {
+    'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥', 'CAD': 'CA$', 'AUD': 'A$', 'INR': '₹',
+}
+
+def is_currency_code(value):
+    return bool(CURRENCY_CODE.match(value or ''))
+
+def minor_digits(currency):
+    return MINOR_UNIT_DIGITS.get(currency, 2)
+
+def to_minor(value, currency='USD'):
+    # Amounts are stored as integers in the currency's smallest unit (cents
+    # for USD). Only plain decimal strings are accepted: no sign, exponent or
+    # digit separators, and no more decimals than the currency has, so an
+    # amount is never rounded or reinterpreted on the way in.
+    match = AMOUNT.fullmatch(str(value).strip())
+    if not match:
+        raise ValueError(f'Not an amount: {value!r}')
+    whole, fraction = match.group(1), match.group(2) or ''
+    digits = minor_digits(currency)
+    if len(fraction) > digits:
+        raise ValueError(f'{currency} amounts have at most {digits} decimal places: {value!r}')
+    minor = int(whole + fraction.ljust(digits, '0'))
+    if minor > MAX_MINOR:
+        raise ValueError(f'Amount out of range: {value!r}')
+    return minor
+
+def parse_amount(value, currency='USD'):
+    # Import files may hold amounts the way export() writes them ("$1,234.50",
+    # "CHF 12.00"), so the currency's own symbol or code and thousands
+    # separators are dropped; anything else is left for to_minor to reject.
+    text = str(value).strip()
+    for prefix in (SYMBOLS.get(currency), currency):
+        if prefix and text.startswith(prefix):
+            text = text[len(prefix):].lstrip()
+            break
+    if THOUSANDS.fullmatch(text):
+        text = text.replace(',', '')
+    return to_minor(text, currency)
+
+def to_major(minor, currency='USD'):
+    return Decimal(int(minor)).scaleb(-minor_digits(currency))
+
+@lru_cache(maxsize=64)
+def money_formatter(currency='USD'):
+    # Everything that depends only on the currency is worked out once; the
+    # returned function is plain integer arithmetic per value, which keeps
+    # formatting cheap across a whole export batch.
+    digits = minor_digits(currency)
+    scale = 10 ** digits
+    prefix = SYMBOLS.get(currency, currency + ' ')
+    
+    def format_minor(minor):
+        sign = '-' if minor < 0 else ''
+        whole, fraction = divmod(abs(int(minor)), scale)
+        if digits:
+            return f'{sign}{prefix}{whole}.{fraction:0{digits}d}'
+        return f'{sign}{prefix}{whole}'
+    return format_minor
+
+def format_money(minor, currency='USD'):
+    return money_formatter(currency or 'USD')(minor or 0)
+
+def format_amounts(values, currencies):
+    # One formatted string per (minor units, currency) pair.
+    return [money_formatter(currency)(minor) for minor, currency in zip(values, currencies)]
@@ -0,0 +1,63 @@
+from datetime import datetime
+from sqlalchemy import bindparam, tuple_, Date, Integer
+from sqlalchemy.orm import joinedload
+from models import db, Purchase
+
+class PurchasePage:
+    def __init__(self, items, next_cursor, page_size):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+def encode_cursor(purchase):
+    return f"{purchase.date_collected.isoformat()}_{purchase.id}"
+
+def decode_cursor(cursor):
+    try:
+        date_part, id_part = cursor.split('_', 1)
+        return datetime.strptime(date_part, '%Y-%m-%d').date(), int(id_part)
+    except (AttributeError, ValueError):
+        return None
+
+def _page_statement(purchase_filter, after_cursor):
+    stmt = purchase_filter.select(Purchase).options(
+        joinedload(Purchase.category),
+        joinedload(Purchase.user),
+        joinedload(Purchase.attachment)
+    )
+    if after_cursor:
+        stmt = stmt.where(
+            tuple_(Purchase.date_collected, Purchase.id)
+            < tuple_(bindparam('cursor_date', type_=Date), bindparam('cursor_id', type_=Integer))
+        )
+    return stmt.order_by(
+        Purchase.date_collected.desc(),
+        Purchase.id.desc()
+    ).limit(bindparam('page_limit', type_=Integer))
+
+def page_query(purchase_filter, cursor=None, page_size=50):
+    # Keyset pagination on (date_collected, id): each page seeks straight to
+    # the last row of the previous one instead of counting past an OFFSET.
+    # Returns the statement and its parameters.
+    position = decode_cursor(cursor) if cursor else None
+    stmt = purchase_filter.statement(
+        'page_after' if position else 'page',
+        lambda f: _page_statement(f, position is not None)
+    )
+    
+    params = dict(purchase_filter.params, page_limit=page_size + 1)
+    if position:
+        params['cursor_date'], params['cursor_id'] = position
+    return stmt, params
+
+def paginate_purchases(purchase_filter, cursor=None, page_size=50):
+    stmt, params = page_query(purchase_filter, cursor, page_size)
+    rows = db.session.execute(stmt, params).scalars().all()
+    
+    items = rows[:page_size]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > page_size else None
+    return PurchasePage(items, next_cursor, page_size)
@@ -0,0 +1,77 @@
+import re
+from datetime import date
+from sqlalchemy import select
+from models import db, Purchase
+from pagination import page_query, encode_cursor
+from csv_export import export_statement
+from aggregates import summary_statement, spend_source
+from filters import PurchaseFilter
+from audit import history_statement
+
+SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+
+SAMPLE_CRITERIA = {
+    'unfiltered': {},
+    'category': {'category_id': 1},
+    'vendor': {'vendor': 'Office Depot'},
+    'type': {'purchase_type': 'product'},
+    'date_range': {'date_from': date(2025, 1, 1), 'date_to': date(2025, 3, 31)},
+    'category_date': {'category_id': 1, 'date_from': date(2025, 1, 1)},
+    'search': {'search': 'paper'},
+}
+
+# Scans that are inherent to the query rather than a missing index: the
+# unfiltered summary reads every rollup row by definition, and without FTS5
+# a substring search cannot use a B-tree index.
+EXPECTED_SCANS = {
+    ('summary', 'unfiltered'): {'spend_rollups'},
+    ('summary', 'search'): {'purchases'},
+}
+
+class _SamplePurchase:
+    date_collected = date(2025, 6, 30)
+    id = 1000
+
+def sample_statements():
+    cursor = encode_cursor(_SamplePurchase)
+    for label, criteria in SAMPLE_CRITERIA.items():
+        purchase_filter = PurchaseFilter(**criteria)
+        params = purchase_filter.params
+        yield ('dashboard_page', label) + page_query(purchase_filter)
+        yield ('dashboard_next_page', label) + page_query(purchase_filter, cursor)
+        yield 'export', label, export_statement(purchase_filter), params
+        # The dashboard always totals within one currency.
+        reporting = purchase_filter.in_currency('USD')
+        yield 'summary', label, summary_statement(reporting, spend_source(reporting)), reporting.params
+    yield 'vendor_options', 'unfiltered', select(Purchase.vendor).distinct(), {}
+    yield 'audit_history', 'purchase', history_statement(1), {}
+    yield 'audit_history', 'before', history_statement(1, before=date(2025, 6, 30)), {}
+
+def explain(statement, params=None):
+    if params:
+        statement = statement.params(params)
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+    return [row[-1] for row in rows]
+
+def full_scans(plan):
+    tables = set(db.metadata.tables)
+    scanned = set()
+    for detail in plan:
+        match = SCAN_PATTERN.match(detail)
+        if match and match.group(1) in tables and 'USING' not in match.group(2):
+            scanned.add(match.group(1))
+    return scanned
+
+def check_query_plans():
+    results = []
+    for name, label, statement, params in sample_statements():
+        plan = explain(statement, params)
+        unexpected = full_scans(plan) - EXPECTED_SCANS.get((name, label), set())
+        results.append({
+            'query': name,
+            'filters': label,
+            'plan': plan,
+            'full_scans': sorted(unexpected),
+        })
+    return results
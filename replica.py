@@ -0,0 +1,46 @@
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+
+READ_BIND = 'read'
+
+def read_database_uri(config):
+    uri = config.get('SQLALCHEMY_READ_DATABASE_URI')
+    if uri:
+        return uri
+    
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    if not config['SQLITE_READ_ONLY_ENGINE']:
+        return None
+    # A second, read-only connection pool on the same file. Under WAL its
+    # readers never wait on the primary's writers, and a stray write from
+    # a read-only route fails loudly instead of taking the write lock.
+    database = url.database[len('file:'):] if url.query.get('uri') else url.database
+    return url.set(
+        database=f'file:{database}',
+        query={'mode': 'ro', 'uri': 'true'}
+    ).render_as_string(hide_password=False)
+
+def use_read_engine():
+    return has_app_context() and g.get('use_read_engine', False)
+
+def read_replica(view):
+    # Opt-in per route: everything the view (and any streamed response it
+    # returns) reads goes to the read engine for the rest of the request.
+    # Flushes still go to the primary.
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        g.use_read_engine = True
+        return view(*args, **kwargs)
+    return decorated_function
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and use_read_engine():
+            engines = self._db.engines
+            if READ_BIND in engines:
+                return engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,103 @@
+from collections import defaultdict
+from sqlalchemy import func, select, insert, update, delete
+from models import db, Purchase, SpendRollup
+from archive import purchase_source
+
+def _group_filter(day, category_id, vendor, purchase_type, currency):
+    if category_id is None:
+        category_match = SpendRollup.category_id.is_(None)
+    else:
+        category_match = SpendRollup.category_id == category_id
+    
+    return (
+        SpendRollup.day == day,
+        category_match,
+        SpendRollup.vendor == vendor,
+        SpendRollup.purchase_type == purchase_type,
+        SpendRollup.currency == currency
+    )
+
+def apply_delta(day, category_id, vendor, purchase_type, currency, count, amount_minor):
+    # Runs on the caller's session, so the rollup change commits or rolls
+    # back together with the purchase rows themselves.
+    result = db.session.execute(
+        update(SpendRollup)
+        .where(*_group_filter(day, category_id, vendor, purchase_type, currency))
+        .values(
+            purchase_count=SpendRollup.purchase_count + count,
+            total_minor=SpendRollup.total_minor + amount_minor
+        )
+        .execution_options(synchronize_session=False)
+    )
+    
+    if result.rowcount == 0:
+        db.session.add(SpendRollup(
+            day=day,
+            category_id=category_id,
+            vendor=vendor,
+            purchase_type=purchase_type,
+            currency=currency,
+            purchase_count=count,
+            total_minor=amount_minor
+        ))
+
+def record_purchase(purchase, sign=1):
+    apply_delta(
+        purchase.date_collected,
+        purchase.category_id,
+        purchase.vendor,
+        purchase.purchase_type,
+        purchase.currency,
+        sign,
+        purchase.amount_minor * purchase.quantity * sign
+    )
+
+def record_purchase_rows(rows):
+    # Bulk paths insert plain dicts; fold them into one delta per group so a
+    # batch touches each rollup row once.
+    deltas = defaultdict(lambda: [0, 0])
+    for row in rows:
+        key = (row['date_collected'], row['category_id'], row['vendor'], row['purchase_type'], row['currency'])
+        deltas[key][0] += 1
+        deltas[key][1] += row['amount_minor'] * row['quantity']
+    
+    for (day, category_id, vendor, purchase_type, currency), (count, amount_minor) in deltas.items():
+        apply_delta(day, category_id, vendor, purchase_type, currency, count, amount_minor)
+
+def remove_purchase(purchase):
+    record_purchase(purchase, sign=-1)
+
+def rebuild_rollups():
+    db.session.execute(delete(SpendRollup))
+    
+    # Archived purchases still count, so rebuild from all of history.
+    source = purchase_source()
+    grouped = select(
+        source.date_collected,
+        source.category_id,
+        source.vendor,
+        source.purchase_type,
+        source.currency,
+        func.count(source.id),
+        func.sum(source.amount_minor * source.quantity)
+    ).group_by(
+        source.date_collected,
+        source.category_id,
+        source.vendor,
+        source.purchase_type,
+        source.currency
+    )
+    
+    db.session.execute(
+        insert(SpendRollup).from_select(
+            ['day', 'category_id', 'vendor', 'purchase_type', 'currency', 'purchase_count', 'total_minor'],
+            grouped
+        )
+    )
+    db.session.commit()
+    
+    return db.session.query(func.count(SpendRollup.id)).scalar()
+
+def ensure_rollups():
+    if db.session.query(SpendRollup.id).first() is None and db.session.query(Purchase.id).first() is not None:
+        rebuild_rollups()
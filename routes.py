@@ -1,14 +1,27 @@
-from flask import render_template, request, redirect, url_for, flash, send_file, jsonify
+from flask import render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.utils import secure_filename
-from models import db, User, Category, Purchase, AuditLog
+from models import db, User, Category, Purchase, Attachment
 from datetime import datetime
-import os
-import json
-import csv
-from io import StringIO, BytesIO
 from functools import wraps
-from sqlalchemy import func, extract
+import hmac
+from pagination import PurchasePage, paginate_purchases
+from csv_export import iter_purchase_csv
+from rollups import record_purchase
+from aggregates import spend_summary, spend_series, GRANULARITIES
+from cache import get_aggregate_cache, cache_key
+from search import ranked_purchases
+from filters import PurchaseFilter
+from importer import import_purchases, detect_format
+from attachments import get_attachment_processor
+from storage import store_blob, abandon_blobs
+from replica import read_replica
+from audit import get_audit_writer, purchase_history
+from archive import purchase_source, needs_history, archived_year, audit_logs_archive
+from user_cache import remember_session_user, forget_session_user
+from throttle import get_login_throttle
+from metrics import get_metrics
+from api import FieldError, parse_fields, purchase_json, conditional_json, major_units, spend_json
+from money import to_minor, minor_digits, format_money, is_currency_code
 
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
@@ -27,8 +40,31 @@ def role_required(role):
         return decorated_function
     return decorator
 
+def api_role_required(role):
+    # role_required for JSON endpoints: status codes instead of redirects.
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return jsonify({'error': 'Authentication required.'}), 401
+            if current_user.role != role and current_user.role != 'dev':
+                return jsonify({'error': 'You do not have permission to access this resource.'}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def invalid_filters(purchase_filter):
+    return jsonify({'error': 'Invalid filters.', 'fields': purchase_filter.errors}), 400
+
+def requested_page_size(config):
+    page_size = request.args.get('per_page', config['PURCHASES_PER_PAGE'], type=int)
+    return max(1, min(page_size, config['MAX_PURCHASES_PER_PAGE']))
+
 def register_routes(app):
     
+    # {{ purchase.amount_minor|money(purchase.currency) }}
+    app.add_template_filter(format_money, 'money')
+    
     @app.route('/')
     def index():
         if current_user.is_authenticated:
@@ -85,10 +121,21 @@ def register_routes(app):
             username = request.form.get('username', '').strip()
             password = request.form.get('password', '')
             
+            throttle = get_login_throttle()
+            retry_after = throttle.attempt(username, request.remote_addr)
+            if retry_after:
+                flash(f'Too many login attempts. Try again in {retry_after} seconds.', 'danger')
+                return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
+            
             user = User.query.filter_by(username=username).first()
             
             if user and user.check_password(password):
+                throttle.succeeded(username)
+                if user.password_needs_rehash():
+                    user.set_password(password)
+                    db.session.commit()
                 login_user(user, remember=True)
+                remember_session_user(user)
                 flash(f'Welcome back, {user.username}!', 'success')
                 next_page = request.args.get('next')
                 return redirect(next_page) if next_page else redirect(url_for('index'))
@@ -101,6 +148,7 @@ def register_routes(app):
     @login_required
     def logout():
         logout_user()
+        forget_session_user()
         flash('You have been logged out.', 'info')
         return redirect(url_for('login'))
     
@@ -108,7 +156,28 @@ def register_routes(app):
     @login_required
     @role_required('dev')
     def dev_home():
-        return render_template('dev_home.html')
+        return render_template(
+            'dev_home.html',
+            cache_stats=get_aggregate_cache().stats(),
+            performance=get_metrics().snapshot()
+        )
+    
+    @app.route('/metrics')
+    def prometheus_metrics():
+        token = app.config['METRICS_TOKEN']
+        bearer = request.headers.get('Authorization', '')
+        scraper = bool(token) and hmac.compare_digest(bearer, f'Bearer {token}')
+        if not scraper and not (current_user.is_authenticated and current_user.role == 'dev'):
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        
+        cache_stats = get_aggregate_cache().stats()
+        extra = [
+            ('expendiforge_aggregate_cache_hits_total', 'counter', 'Aggregate cache hits.', cache_stats['hits']),
+            ('expendiforge_aggregate_cache_misses_total', 'counter', 'Aggregate cache misses.', cache_stats['misses']),
+            ('expendiforge_aggregate_cache_entries', 'gauge', 'Entries in the aggregate cache.', cache_stats['entries']),
+            ('expendiforge_audit_events_pending', 'gauge', 'Audit events buffered but not yet written.', get_audit_writer().pending()),
+        ]
+        return Response(get_metrics().render(extra), mimetype='text/plain; version=0.0.4')
     
     @app.route('/upload', methods=['GET', 'POST'])
     @login_required
@@ -117,9 +186,11 @@ def register_routes(app):
         categories = Category.query.all()
         
         if request.method == 'POST':
+            stored = None
             try:
                 description = request.form.get('description', '').strip()
                 amount = request.form.get('amount', '').strip()
+                currency = request.form.get('currency', '').strip().upper() or app.config['CURRENCY']
                 quantity = request.form.get('quantity', '1').strip()
                 vendor = request.form.get('vendor', '').strip()
                 date_collected = request.form.get('date_collected', '').strip()
@@ -132,12 +203,16 @@ def register_routes(app):
                     flash('Description, amount, vendor, and date are required.', 'danger')
                     return render_template('upload.html', categories=categories)
                 
+                if not is_currency_code(currency):
+                    flash('Currency must be a three-letter ISO 4217 code.', 'danger')
+                    return render_template('upload.html', categories=categories)
+                
                 try:
-                    amount = float(amount)
-                    if amount <= 0:
+                    amount_minor = to_minor(amount, currency)
+                    if amount_minor <= 0:
                         raise ValueError()
                 except ValueError:
-                    flash('Amount must be a positive number.', 'danger')
+                    flash(f'Amount must be a positive number with at most {minor_digits(currency)} decimal places.', 'danger')
                     return render_template('upload.html', categories=categories)
                 
                 try:
@@ -155,16 +230,23 @@ def register_routes(app):
                     return render_template('upload.html', categories=categories)
                 
                 attachment_url = None
+                attachment = None
                 if 'attachment' in request.files:
                     file = request.files['attachment']
                     if file and file.filename:
                         if allowed_file(file.filename, app.config['ALLOWED_EXTENSIONS']):
-                            filename = secure_filename(file.filename)
-                            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-                            filename = f"{timestamp}_{filename}"
-                            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                            file.save(filepath)
-                            attachment_url = f"uploads/{filename}"
+                            # Stored under its content hash: uploading the same
+                            # receipt twice keeps one file with two references.
+                            extension = '.' + file.filename.rsplit('.', 1)[1].lower()
+                            stored = store_blob(file.stream, extension)
+                            attachment_url = f"uploads/{stored.key}"
+                            attachment = Attachment(
+                                filename=stored.key,
+                                original_filename=file.filename,
+                                content_type=file.mimetype,
+                                size=stored.size,
+                                sha256=stored.sha256
+                            )
                         else:
                             flash('Invalid file type. Only PDF, JPG, and PNG are allowed.', 'danger')
                             return render_template('upload.html', categories=categories)
@@ -172,219 +254,247 @@ def register_routes(app):
                 purchase = Purchase(
                     user_id=current_user.id,
                     description=description,
-                    amount=amount,
+                    amount_minor=amount_minor,
+                    currency=currency,
                     quantity=quantity,
                     vendor=vendor,
                     date_collected=date_obj,
                     purchase_type=purchase_type,
                     category_id=int(category_id) if category_id else None,
                     attachment_url=attachment_url,
+                    attachment=attachment,
                     notes=notes,
                     paid_on_collection=paid_on_collection
                 )
                 db.session.add(purchase)
                 db.session.flush()
+                record_purchase(purchase)
                 
                 audit_data = {
                     'description': description,
-                    'amount': amount,
+                    'amount_minor': amount_minor,
+                    'currency': currency,
                     'quantity': quantity,
                     'vendor': vendor,
                     'date_collected': date_collected,
                     'purchase_type': purchase_type,
-                    'category_id': category_id,
+                    'category_id': int(category_id) if category_id else None,
                     'notes': notes,
                     'paid_on_collection': paid_on_collection
                 }
-                
-                audit_log = AuditLog(
-                    purchase_id=purchase.id,
-                    user_id=current_user.id,
-                    action='create',
-                    changes=json.dumps(audit_data)
-                )
-                db.session.add(audit_log)
+                purchase_id = purchase.id
+                attachment_id = attachment.id if attachment else None
                 db.session.commit()
                 
+                # The audit event is buffered and written in a batch, off the
+                # request's transaction.
+                get_audit_writer().record(purchase_id, current_user.id, 'create', audit_data)
+                
+                # Hashing, thumbnails and resizing happen on the worker pool
+                # once the row is committed; the request is done here.
+                if attachment_id:
+                    get_attachment_processor().submit(attachment_id)
+                
                 flash('Purchase uploaded successfully!', 'success')
                 return redirect(url_for('upload'))
                 
             except Exception as e:
                 db.session.rollback()
+                if stored:
+                    abandon_blobs([stored])
+                    db.session.commit()
                 flash(f'An error occurred: {str(e)}', 'danger')
         
         return render_template('upload.html', categories=categories)
     
-    @app.route('/dashboard')
+    @app.route('/import', methods=['GET', 'POST'])
     @login_required
     @role_required('admin')
-    def dashboard():
-        search_query = request.args.get('search', '').strip()
-        category_filter = request.args.get('category', '').strip()
-        vendor_filter = request.args.get('vendor', '').strip()
-        type_filter = request.args.get('type', '').strip()
-        date_from = request.args.get('date_from', '').strip()
-        date_to = request.args.get('date_to', '').strip()
-        
-        query = Purchase.query
-        
-        if search_query:
-            query = query.filter(
-                (Purchase.description.contains(search_query)) | 
-                (Purchase.vendor.contains(search_query))
-            )
-        
-        if category_filter:
-            query = query.filter_by(category_id=int(category_filter))
-        
-        if vendor_filter:
-            query = query.filter_by(vendor=vendor_filter)
-        
-        if type_filter:
-            query = query.filter_by(purchase_type=type_filter)
+    def bulk_import():
+        report = None
         
-        if date_from:
-            try:
-                date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-                query = query.filter(Purchase.date_collected >= date_from_obj)
-            except ValueError:
-                pass
-        
-        if date_to:
+        if request.method == 'POST':
+            file = request.files.get('file')
+            if not file or not file.filename:
+                flash('Choose a CSV or JSON file to import.', 'danger')
+                return render_template('import.html', report=None)
+            
+            fmt = request.form.get('format') or detect_format(file.filename)
             try:
-                date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-                query = query.filter(Purchase.date_collected <= date_to_obj)
-            except ValueError:
-                pass
-        
-        purchases = query.order_by(Purchase.date_collected.desc()).all()
-        
-        total_spend = db.session.query(
-            func.sum(Purchase.amount * Purchase.quantity)
-        ).scalar() or 0
-        
-        category_totals = db.session.query(
-            Category.name,
-            func.sum(Purchase.amount * Purchase.quantity)
-        ).join(Purchase).group_by(Category.name).all()
-        
-        vendor_totals = db.session.query(
-            Purchase.vendor,
-            func.sum(Purchase.amount * Purchase.quantity)
-        ).group_by(Purchase.vendor).order_by(
-            func.sum(Purchase.amount * Purchase.quantity).desc()
-        ).limit(10).all()
-        
-        type_totals = db.session.query(
-            Purchase.purchase_type,
-            func.sum(Purchase.amount * Purchase.quantity)
-        ).group_by(Purchase.purchase_type).all()
-        
-        monthly_totals = db.session.query(
-            extract('year', Purchase.date_collected).label('year'),
-            extract('month', Purchase.date_collected).label('month'),
-            func.sum(Purchase.amount * Purchase.quantity).label('total')
-        ).group_by('year', 'month').order_by('year', 'month').all()
+                report = import_purchases(
+                    file.stream, fmt, current_user, app.config['IMPORT_BATCH_SIZE'], app.config['CURRENCY']
+                )
+            except ValueError as e:
+                db.session.rollback()
+                flash(str(e), 'danger')
+                return render_template('import.html', report=None)
+            
+            category = 'warning' if report.failed else 'success'
+            flash(f'Imported {report.imported} purchases, {report.failed} rows rejected.', category)
         
-        categories = Category.query.all()
-        vendors = db.session.query(Purchase.vendor).distinct().all()
+        return render_template('import.html', report=report)
+    
+    @app.route('/dashboard')
+    @login_required
+    @role_required('admin')
+    @read_replica
+    def dashboard():
+        purchase_filter = PurchaseFilter.from_args(request.args)
+        for message in purchase_filter.errors.values():
+            flash(f'Ignored filter: {message}', 'warning')
+        
+        page_size = requested_page_size(app.config)
+        cursor = request.args.get('cursor', '').strip()
+        sort = request.args.get('sort', 'date')
+        
+        ranked = None
+        if purchase_filter.search and sort == 'relevance':
+            ranked = ranked_purchases(purchase_filter.apply(Purchase.query), purchase_filter.search, page_size)
+        if ranked is not None:
+            page = PurchasePage(ranked, None, page_size)
+        else:
+            page = paginate_purchases(purchase_filter, cursor=cursor, page_size=page_size)
+        
+        reporting = purchase_filter.in_currency(app.config['CURRENCY'])
+        aggregate_cache = get_aggregate_cache()
+        summary = aggregate_cache.get_or_compute(
+            cache_key('summary', reporting.criteria),
+            lambda: spend_summary(reporting)
+        )
+        categories = aggregate_cache.get_or_compute(
+            cache_key('categories'),
+            lambda: db.session.query(Category.id, Category.name).all()
+        )
+        vendors = aggregate_cache.get_or_compute(
+            cache_key('vendors'),
+            lambda: [v[0] for v in db.session.query(Purchase.vendor).distinct().all()]
+        )
+        # Counted on the hot table the pages come from, in every currency;
+        # the summary's count covers archived years and only the reporting
+        # currency, like its totals.
+        listed_count = aggregate_cache.get_or_compute(
+            cache_key('listed_count', purchase_filter.criteria),
+            purchase_filter.count
+        )
         
         return render_template(
             'dashboard.html',
-            purchases=purchases,
-            total_spend=total_spend,
-            category_totals=category_totals,
-            vendor_totals=vendor_totals,
-            type_totals=type_totals,
-            monthly_totals=monthly_totals,
+            purchases=page.items,
+            page=page,
+            cursor=cursor,
+            sort=sort,
             categories=categories,
-            vendors=[v[0] for v in vendors],
-            filters={
-                'search': search_query,
-                'category': category_filter,
-                'vendor': vendor_filter,
-                'type': type_filter,
-                'date_from': date_from,
-                'date_to': date_to
-            }
+            vendors=vendors,
+            filters=purchase_filter.args,
+            listed_count=listed_count,
+            archived=needs_history(purchase_filter.date_from),
+            high_spend_minor=app.config['HIGH_SPEND_AMOUNT'] * 10 ** minor_digits(summary['currency']),
+            **summary
         )
     
     @app.route('/export')
     @login_required
     @role_required('admin')
+    @read_replica
     def export():
-        search_query = request.args.get('search', '').strip()
-        category_filter = request.args.get('category', '').strip()
-        vendor_filter = request.args.get('vendor', '').strip()
-        type_filter = request.args.get('type', '').strip()
-        date_from = request.args.get('date_from', '').strip()
-        date_to = request.args.get('date_to', '').strip()
-        
-        query = Purchase.query
-        
-        if search_query:
-            query = query.filter(
-                (Purchase.description.contains(search_query)) | 
-                (Purchase.vendor.contains(search_query))
-            )
-        
-        if category_filter:
-            query = query.filter_by(category_id=int(category_filter))
-        
-        if vendor_filter:
-            query = query.filter_by(vendor=vendor_filter)
-        
-        if type_filter:
-            query = query.filter_by(purchase_type=type_filter)
-        
-        if date_from:
-            try:
-                date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-                query = query.filter(Purchase.date_collected >= date_from_obj)
-            except ValueError:
-                pass
-        
-        if date_to:
-            try:
-                date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-                query = query.filter(Purchase.date_collected <= date_to_obj)
-            except ValueError:
-                pass
-        
-        purchases = query.order_by(Purchase.date_collected.desc()).all()
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        writer.writerow([
-            'ID', 'Date', 'Description', 'Vendor', 'Type', 'Category',
-            'Quantity', 'Amount', 'Total', 'Paid on Collection', 'Notes', 'Uploaded By'
-        ])
-        
-        for purchase in purchases:
-            category_name = purchase.category.name if purchase.category else 'N/A'
-            total = purchase.amount * purchase.quantity
-            paid = 'Yes' if purchase.paid_on_collection else 'No'
-            
-            writer.writerow([
-                purchase.id,
-                purchase.date_collected,
-                purchase.description,
-                purchase.vendor,
-                purchase.purchase_type,
-                category_name,
-                purchase.quantity,
-                f'${purchase.amount:.2f}',
-                f'${total:.2f}',
-                paid,
-                purchase.notes or '',
-                purchase.user.username
-            ])
-        
-        output.seek(0)
-        return send_file(
-            BytesIO(output.getvalue().encode('utf-8')),
+        purchase_filter = PurchaseFilter.from_args(request.args)
+        if purchase_filter.errors:
+            for message in purchase_filter.errors.values():
+                flash(message, 'danger')
+            return redirect(url_for('dashboard', **request.args))
+        
+        # Ranges reaching back past the archive horizon read the unified view
+        # over the hot and archived purchases instead.
+        entity = purchase_source(purchase_filter.date_from)
+        
+        filename = f'purchases_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        return Response(
+            stream_with_context(iter_purchase_csv(purchase_filter, app.config['EXPORT_BATCH_SIZE'], entity)),
             mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'purchases_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    
+    @app.route('/api/purchases')
+    @api_role_required('admin')
+    @read_replica
+    def api_purchases():
+        purchase_filter = PurchaseFilter.from_args(request.args)
+        if purchase_filter.errors:
+            return invalid_filters(purchase_filter)
+        try:
+            fields = parse_fields(request.args.get('fields', '').strip())
+        except FieldError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        page_size = requested_page_size(app.config)
+        page = paginate_purchases(
+            purchase_filter,
+            cursor=request.args.get('cursor', '').strip(),
+            page_size=page_size
+        )
+        payload = {
+            'items': [purchase_json(purchase, fields) for purchase in page.items],
+            'next_cursor': page.next_cursor,
+            'per_page': page_size
+        }
+        if request.args.get('count') == '1':
+            payload['total_count'] = purchase_filter.count()
+        return conditional_json(payload)
+    
+    @app.route('/api/aggregates')
+    @api_role_required('admin')
+    @read_replica
+    def api_aggregates():
+        purchase_filter = PurchaseFilter.from_args(request.args)
+        if purchase_filter.errors:
+            return invalid_filters(purchase_filter)
+        granularity = request.args.get('granularity', 'month')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': f"granularity must be one of: {', '.join(GRANULARITIES)}."}), 400
+        
+        reporting = purchase_filter.in_currency(app.config['CURRENCY'])
+        currency = reporting.currency
+        aggregate_cache = get_aggregate_cache()
+        summary = aggregate_cache.get_or_compute(
+            cache_key('summary', reporting.criteria),
+            lambda: spend_summary(reporting)
+        )
+        series = aggregate_cache.get_or_compute(
+            cache_key('series', dict(reporting.criteria, granularity=granularity)),
+            lambda: spend_series(reporting, granularity)
         )
+        return conditional_json({
+            'granularity': granularity,
+            'currency': currency,
+            'total_spend': major_units(summary['total_spend'], currency),
+            'total_spend_minor': summary['total_spend'],
+            'purchase_count': summary['purchase_count'],
+            'by_category': spend_json('category', summary['category_totals'], currency),
+            'by_vendor': spend_json('vendor', summary['vendor_totals'], currency),
+            'by_type': spend_json('type', summary['type_totals'], currency),
+            'series': [dict(row, total=major_units(row['total_minor'], currency)) for row in series]
+        })
+    
+    @app.route('/api/purchases/<int:purchase_id>/history')
+    @api_role_required('admin')
+    def purchase_history_api(purchase_id):
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        before = request.args.get('before')
+        if before:
+            try:
+                before = datetime.fromisoformat(before)
+            except ValueError:
+                return jsonify({'error': 'before must be an ISO timestamp.'}), 400
+        
+        audit_table = None
+        if db.session.get(Purchase, purchase_id) is None:
+            year = archived_year(purchase_id)
+            if year is None:
+                return jsonify({'error': 'Purchase not found.'}), 404
+            audit_table = audit_logs_archive(year)
+        events = purchase_history(purchase_id, limit=limit, before=before or None, table=audit_table)
+        return jsonify({
+            'purchase_id': purchase_id,
+            'events': events,
+            'next_before': events[-1]['timestamp'] if len(events) == limit else None
+        })
@@ -0,0 +1,106 @@
+import re
+from flask import current_app, has_app_context
+from sqlalchemy import select, table, column, literal_column, text
+from sqlalchemy.orm import joinedload
+from models import db, Purchase
+
+FTS_TABLE = 'purchases_fts'
+
+fts = table(FTS_TABLE, column('rowid'), column('rank'))
+
+# External-content FTS5 index: the text lives only in purchases, and the
+# triggers keep the index in step with every insert, update and delete,
+# whichever code path (ORM, Core, raw SQL) made the change.
+SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description, vendor, notes,
+        content='purchases', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON purchases BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, vendor, notes)
+        VALUES (new.id, new.description, new.vendor, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON purchases BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, vendor, notes)
+        VALUES ('delete', old.id, old.description, old.vendor, old.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF description, vendor, notes ON purchases BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, vendor, notes)
+        VALUES ('delete', old.id, old.description, old.vendor, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, description, vendor, notes)
+        VALUES (new.id, new.description, new.vendor, new.notes);
+    END""",
+]
+
+def fts5_supported():
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    options = db.session.execute(text('PRAGMA compile_options')).scalars().all()
+    return 'ENABLE_FTS5' in options
+
+def ensure_search_index(app):
+    available = fts5_supported()
+    if available:
+        exists = search_index_exists()
+        for statement in SCHEMA:
+            db.session.execute(text(statement))
+        if not exists:
+            rebuild_search_index()
+        db.session.commit()
+    app.extensions['search_index'] = available
+    return available
+
+def rebuild_search_index():
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    db.session.commit()
+
+def search_index_exists():
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first() is not None
+
+def search_available():
+    if not has_app_context():
+        return False
+    # Looked up on first use rather than at startup, then remembered.
+    available = current_app.extensions.get('search_index')
+    if available is None:
+        available = current_app.extensions['search_index'] = search_index_exists()
+    return available
+
+def match_expression(search):
+    # Quote every word so user input can't inject FTS5 query syntax, and
+    # make each one a prefix match: "offi dep" finds "Office Depot".
+    terms = re.findall(r'\w+', search)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def _matches(expression):
+    return literal_column(FTS_TABLE).match(expression)
+
+def match_condition(expression):
+    return Purchase.id.in_(select(fts.c.rowid).where(_matches(expression)))
+
+def ranked_purchases(query, search, limit):
+    expression = match_expression(search)
+    if not (search_available() and expression):
+        return None
+    
+    ranked = select(fts.c.rowid, fts.c.rank).where(_matches(expression)).subquery()
+    return query.options(
+        joinedload(Purchase.category),
+        joinedload(Purchase.user),
+        joinedload(Purchase.attachment)
+    ).join(
+        ranked, Purchase.id == ranked.c.rowid
+    ).order_by(ranked.c.rank, Purchase.id.desc()).limit(limit).all()
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Keep Alembic autogenerate from proposing to drop the FTS5 virtual
+    # table and its shadow tables, which the models don't declare.
+    if type_ == 'table' and reflected and compare_to is None:
+        return not name.startswith(FTS_TABLE)
+    return True
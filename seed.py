@@ -0,0 +1,57 @@
+from sqlalchemy import select
+from models import db, User, Category
+
+def seed_categories():
+    initial_categories = [
+        'Office Supplies',
+        'Electronics',
+        'Services',
+        'Miscellaneous'
+    ]
+    
+    existing = set(db.session.execute(
+        select(Category.name).where(Category.name.in_(initial_categories))
+    ).scalars())
+    for cat_name in initial_categories:
+        if cat_name not in existing:
+            category = Category(name=cat_name, description='')
+            db.session.add(category)
+    
+    db.session.commit()
+
+def seed_dev_users():
+    dev_users = [
+        {
+            'username': 'shopper',
+            'email': 'shopper@dev.com',
+            'password': 'shopper123',
+            'role': 'shopper'
+        },
+        {
+            'username': 'admin',
+            'email': 'admin@dev.com',
+            'password': 'admin123',
+            'role': 'admin'
+        },
+        {
+            'username': 'dev',
+            'email': 'dev@dev.com',
+            'password': 'dev123',
+            'role': 'dev'
+        }
+    ]
+    
+    existing = set(db.session.execute(
+        select(User.username).where(User.username.in_([user_data['username'] for user_data in dev_users]))
+    ).scalars())
+    for user_data in dev_users:
+        if user_data['username'] not in existing:
+            user = User(
+                username=user_data['username'],
+                email=user_data['email'],
+                role=user_data['role']
+            )
+            user.set_password(user_data['password'])
+            db.session.add(user)
+    
+    db.session.commit()
@@ -0,0 +1,100 @@
+import gzip
+import os
+import zlib
+from functools import lru_cache
+from flask import request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+def _should_compress(response, config):
+    if request.method == 'HEAD' or 'Content-Encoding' in response.headers:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    # send_file responses (static files, attachments) pass the file through
+    # untouched.
+    if response.direct_passthrough:
+        return False
+    if not response.is_streamed and (response.content_length or 0) < config['COMPRESS_MIN_SIZE']:
+        return False
+    return _accepts_gzip()
+
+def _gzip_chunks(source, level):
+    # Each chunk is flushed as it's compressed, so a streamed export still
+    # reaches the client batch by batch instead of at the end.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in source:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+
+def compress_response(response, config):
+    if response.mimetype not in config['COMPRESS_MIMETYPES']:
+        return response
+    response.vary.add('Accept-Encoding')
+    if not _should_compress(response, config):
+        return response
+    
+    level = config['COMPRESS_LEVEL']
+    if response.is_streamed:
+        response.response = _gzip_chunks(response.response, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=level, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    
+    # The body differs byte for byte from the one the ETag was computed on;
+    # a weak ETag still matches If-None-Match, so revalidation keeps working.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def _install_compression(app):
+    @app.after_request
+    def gzip_response(response):
+        return compress_response(response, app.config)
+
+def _install_static_versions(app):
+    # Static URLs carry the file's modification time, so the files can be
+    # cached for SEND_FILE_MAX_AGE_DEFAULT and still be refetched as soon as
+    # they change.
+    @lru_cache(maxsize=4096)
+    def cached_version(filename):
+        return file_version(filename)
+    
+    def file_version(filename):
+        try:
+            return int(os.stat(os.path.join(app.static_folder, filename)).st_mtime)
+        except OSError:
+            return None
+    
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        if endpoint != 'static' or 'filename' not in values or 'v' in values:
+            return
+        version = file_version(values['filename']) if app.debug else cached_version(values['filename'])
+        if version is not None:
+            values['v'] = version
+
+def _install_proxy_fix(app):
+    # Behind a proxy every request would otherwise come from the proxy's
+    # address, and the per-IP login limit would be one bucket for everyone.
+    count = app.config['PROXY_COUNT']
+    if count > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=count, x_proto=count, x_host=count)
+
+def init_serving(app):
+    _install_proxy_fix(app)
+    if app.config['COMPRESS_ENABLED']:
+        _install_compression(app)
+    _install_static_versions(app)
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
+from backends import load_backend
+from models import db, StoredBlob
+
+CHUNK_SIZE = 64 * 1024
+
+StoredFile = namedtuple('StoredFile', ['key', 'sha256', 'size'])
+
+def content_key(sha256, extension):
+    # Two levels of two-hex-digit shards keep any one directory small.
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+class AttachmentStorage:
+    # Interface for attachment backends. Keys are content-addressed paths
+    # relative to the storage root and double as the attachment filename.
+    
+    @classmethod
+    def from_app(cls, app):
+        return cls()
+    
+    def put(self, stream, extension):
+        raise NotImplementedError
+    
+    def open(self, key):
+        raise NotImplementedError
+    
+    def exists(self, key):
+        raise NotImplementedError
+    
+    def delete(self, key):
+        raise NotImplementedError
+
+class LocalFileStorage(AttachmentStorage):
+    def __init__(self, root):
+        self.root = root
+    
+    @classmethod
+    def from_app(cls, app):
+        return cls(app.config['UPLOAD_FOLDER'])
+    
+    def path(self, key):
+        return os.path.join(self.root, key)
+    
+    def put(self, stream, extension):
+        # Hash while copying to a temp file in the same filesystem, then move
+        # it into its content address. A second copy of the same bytes just
+        # discards the temp file.
+        temp_dir = os.path.join(self.root, '.incoming')
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            
+            key = content_key(digest.hexdigest(), extension)
+            final_path = self.path(key)
+            if os.path.exists(final_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        return StoredFile(key, digest.hexdigest(), size)
+    
+    def open(self, key):
+        return open(self.path(key), 'rb')
+    
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+    
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+BACKENDS = {
+    'local': LocalFileStorage,
+}
+
+def init_attachment_storage(app):
+    backend_class = load_backend(app.config['ATTACHMENT_STORAGE'], BACKENDS)
+    app.extensions['attachment_storage'] = backend_class.from_app(app)
+
+def get_attachment_storage():
+    return current_app.extensions['attachment_storage']
+
+def acquire_blob(stored):
+    # Reference counts live in the caller's transaction, so a rolled back
+    # upload never leaves a count that points at nothing.
+    result = db.session.execute(
+        update(StoredBlob)
+        .where(StoredBlob.key == stored.key)
+        .values(ref_count=StoredBlob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return
+    
+    try:
+        with db.session.begin_nested():
+            db.session.add(StoredBlob(key=stored.key, sha256=stored.sha256, size=stored.size, ref_count=1))
+    except IntegrityError:
+        # Another request stored the same bytes first.
+        acquire_blob(stored)
+
+def release_blob(key):
+    db.session.execute(
+        update(StoredBlob)
+        .where(StoredBlob.key == key, StoredBlob.ref_count > 0)
+        .values(ref_count=StoredBlob.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def store_blob(stream, extension):
+    # put() trusts a file already at the content address, but that may be an
+    # unreferenced blob collect_garbage() removes before the reference is
+    # taken. Once acquire_blob() has run the collector can't delete it any
+    # more, so the file is checked again then and written back if it's gone.
+    storage = get_attachment_storage()
+    stored = storage.put(stream, extension)
+    acquire_blob(stored)
+    if not storage.exists(stored.key):
+        stream.seek(0)
+        stored = storage.put(stream, extension)
+    return stored
+
+def abandon_blobs(stored_files):
+    # For files stored in a transaction that was then rolled back, taking
+    # their StoredBlob rows with it. A zero-count row hands each file to
+    # collect_garbage(); a key that already has a row is left to its count.
+    for stored in stored_files:
+        try:
+            with db.session.begin_nested():
+                db.session.add(StoredBlob(key=stored.key, sha256=stored.sha256, size=stored.size, ref_count=0))
+        except IntegrityError:
+            pass
+
+def collect_garbage():
+    # Files are only removed here, after the count reaching zero has been
+    # committed, never inline with the write that released them. The delete
+    # re-checks the count in case an upload re-acquired the blob meanwhile,
+    # and the file goes before the delete commits: an upload of the same
+    # bytes waits in acquire_blob() until then, and store_blob() finds the
+    # file missing and writes it again.
+    storage = get_attachment_storage()
+    keys = db.session.query(StoredBlob.key).filter(StoredBlob.ref_count <= 0).all()
+    
+    removed = 0
+    for (key,) in keys:
+        result = db.session.execute(
+            delete(StoredBlob).where(StoredBlob.key == key, StoredBlob.ref_count <= 0)
+        )
+        if result.rowcount:
+            storage.delete(key)
+            removed += 1
+        db.session.commit()
+    return removed
@@ -0,0 +1,86 @@
+import pytest
+from money import MAX_MINOR, to_minor, parse_amount, format_money, money_formatter
+
+@pytest.mark.parametrize('value, currency, expected', [
+    ('12', 'USD', 1200),
+    ('12.5', 'USD', 1250),
+    ('12.34', 'USD', 1234),
+    ('0.01', 'USD', 1),
+    (' 7.10 ', 'EUR', 710),
+    ('1000', 'JPY', 1000),
+    ('1.234', 'KWD', 1234),
+    ('1.2', 'KWD', 1200),
+    ('12.34', 'CHF', 1234),
+])
+def test_to_minor_uses_currency_exponent(value, currency, expected):
+    assert to_minor(value, currency) == expected
+
+@pytest.mark.parametrize('value, currency', [
+    ('1.005', 'USD'),
+    ('12.5', 'JPY'),
+    ('1.2345', 'KWD'),
+])
+def test_to_minor_rejects_extra_decimals_instead_of_rounding(value, currency):
+    with pytest.raises(ValueError):
+        to_minor(value, currency)
+
+@pytest.mark.parametrize('value', [
+    '1e3', '1E3', 'nan', 'NaN', 'inf', 'Infinity', '-5', '-0.01', '+5',
+    '1_000', '1,000', '5 dollars 3', '$5', '', ' ', '.5', '5.', '1.2.3', '١٢',
+])
+def test_to_minor_rejects_anything_but_plain_decimals(value):
+    with pytest.raises(ValueError):
+        to_minor(value)
+
+def test_to_minor_range():
+    assert to_minor(str(MAX_MINOR), 'JPY') == MAX_MINOR
+    with pytest.raises(ValueError):
+        to_minor(str(MAX_MINOR + 1), 'JPY')
+    with pytest.raises(ValueError):
+        to_minor(str(MAX_MINOR // 100 + 1), 'USD')
+
+@pytest.mark.parametrize('value, currency, expected', [
+    ('$1,234.50', 'USD', 123450),
+    ('1,234,567.89', 'USD', 123456789),
+    ('$ 3', 'USD', 300),
+    ('USD 3.25', 'USD', 325),
+    ('CHF 12.00', 'CHF', 1200),
+    ('CA$9.99', 'CAD', 999),
+    ('¥1,000', 'JPY', 1000),
+    ('€0.50', 'EUR', 50),
+])
+def test_parse_amount_strips_symbol_code_and_thousands(value, currency, expected):
+    assert parse_amount(value, currency) == expected
+
+@pytest.mark.parametrize('value, currency', [
+    ('€5', 'USD'),
+    ('12,34', 'EUR'),
+    ('1,23,456', 'USD'),
+    ('-$5', 'USD'),
+    ('$-5', 'USD'),
+    ('$1e3', 'USD'),
+    ('5 USD', 'USD'),
+    ('¥1,000.5', 'JPY'),
+])
+def test_parse_amount_rejects_other_input(value, currency):
+    with pytest.raises(ValueError):
+        parse_amount(value, currency)
+
+@pytest.mark.parametrize('minor, currency, expected', [
+    (123450, 'USD', '$1234.50'),
+    (5, 'USD', '$0.05'),
+    (0, 'USD', '$0.00'),
+    (-1999, 'EUR', '-€19.99'),
+    (1000, 'JPY', '¥1000'),
+    (1234, 'KWD', 'KWD 1.234'),
+    (1200, 'CHF', 'CHF 12.00'),
+])
+def test_format_minor(minor, currency, expected):
+    assert money_formatter(currency)(minor) == expected
+
+@pytest.mark.parametrize('value, currency', [
+    ('1234.50', 'USD'), ('1000', 'JPY'), ('1.234', 'KWD'), ('12.00', 'CHF'),
+])
+def test_formatted_amounts_import_back(value, currency):
+    minor = to_minor(value, currency)
+    assert parse_amount(format_money(minor, currency), currency) == minor
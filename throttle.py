@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from flask import current_app
+from sqlalchemy import select, update, insert, delete, case
+from sqlalchemy.exc import IntegrityError
+from backends import load_backend
+from models import db, ThrottleCounter
+
+class ThrottleBackend:
+    # Fixed-window counters. hit() adds one to the key's current window and
+    # returns (count, seconds until the window resets).
+    
+    @classmethod
+    def from_app(cls, app):
+        return cls()
+    
+    def hit(self, key, window):
+        raise NotImplementedError
+    
+    def reset(self, key):
+        raise NotImplementedError
+
+class MemoryThrottle(ThrottleBackend):
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._counters = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_app(cls, app):
+        return cls(max_keys=app.config['LOGIN_THROTTLE_MAX_KEYS'])
+    
+    def _prune(self, now):
+        expired = [key for key, (expires_at, _) in self._counters.items() if expires_at <= now]
+        for key in expired:
+            del self._counters[key]
+        # Still full of live windows: drop the oldest rather than grow.
+        while len(self._counters) >= self.max_keys:
+            del self._counters[next(iter(self._counters))]
+    
+    def hit(self, key, window):
+        now = time.monotonic()
+        with self._lock:
+            expires_at, count = self._counters.get(key, (0, 0))
+            if expires_at <= now:
+                if len(self._counters) >= self.max_keys:
+                    self._prune(now)
+                expires_at, count = now + window, 0
+            count += 1
+            self._counters[key] = (expires_at, count)
+            return count, expires_at - now
+    
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+class DatabaseThrottle(ThrottleBackend):
+    # Counters in the throttle_counters table, shared by every worker
+    # process. Each hit runs in its own short transaction on the primary
+    # engine, apart from the request's session.
+    
+    def _key(self, key):
+        return ':'.join(str(part) for part in key)
+    
+    def _increment(self, connection, key, window, now):
+        expired = ThrottleCounter.expires_at <= now
+        return connection.execute(
+            update(ThrottleCounter)
+            .where(ThrottleCounter.key == key)
+            .values(
+                count=case((expired, 1), else_=ThrottleCounter.count + 1),
+                expires_at=case((expired, now + window), else_=ThrottleCounter.expires_at)
+            )
+        ).rowcount
+    
+    def hit(self, key, window):
+        key = self._key(key)
+        now = time.time()
+        with db.engine.begin() as connection:
+            if not self._increment(connection, key, window, now):
+                # A new key: clear out windows that have ended, which keeps
+                # the table down to the keys seen in the last window.
+                connection.execute(delete(ThrottleCounter).where(ThrottleCounter.expires_at <= now))
+                try:
+                    with connection.begin_nested():
+                        connection.execute(insert(ThrottleCounter).values(key=key, count=1, expires_at=now + window))
+                except IntegrityError:
+                    # Another process counted the first attempt.
+                    self._increment(connection, key, window, now)
+            count, expires_at = connection.execute(
+                select(ThrottleCounter.count, ThrottleCounter.expires_at).where(ThrottleCounter.key == key)
+            ).one()
+        return count, expires_at - now
+    
+    def reset(self, key):
+        with db.engine.begin() as connection:
+            connection.execute(delete(ThrottleCounter).where(ThrottleCounter.key == self._key(key)))
+
+BACKENDS = {
+    'memory': MemoryThrottle,
+    'database': DatabaseThrottle,
+}
+
+class LoginThrottle:
+    # Counted before the user lookup and the password hash, so a rejected
+    # attempt costs one counter update, and a concurrent burst can't slip
+    # past the limit while the first hashes are still running. A successful
+    # login clears the username's count; the IP's keeps running.
+    
+    def __init__(self, backend, window=300, max_per_username=5, max_per_ip=20):
+        self.backend = backend
+        self.window = window
+        self.max_per_username = max_per_username
+        self.max_per_ip = max_per_ip
+    
+    def _username_key(self, username):
+        return ('login-user', username.lower())
+    
+    def attempt(self, username, ip):
+        wait = 0
+        for key, limit in ((self._username_key(username), self.max_per_username), (('login-ip', ip), self.max_per_ip)):
+            count, remaining = self.backend.hit(key, self.window)
+            if count > limit:
+                wait = max(wait, remaining)
+        return math.ceil(wait) if wait else None
+    
+    def succeeded(self, username):
+        self.backend.reset(self._username_key(username))
+
+def init_login_throttle(app):
+    backend_class = load_backend(app.config['LOGIN_THROTTLE_BACKEND'], BACKENDS)
+    app.extensions['login_throttle'] = LoginThrottle(
+        backend_class.from_app(app),
+        window=app.config['LOGIN_THROTTLE_WINDOW'],
+        max_per_username=app.config['LOGIN_MAX_ATTEMPTS_PER_USERNAME'],
+        max_per_ip=app.config['LOGIN_MAX_ATTEMPTS_PER_IP']
+    )
+
+def get_login_throttle():
+    return current_app.extensions['login_throttle']
@@ -0,0 +1,138 @@
+import time
+from flask import current_app, has_app_context, session
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, User
+from cache import MemoryCache
+
+SESSION_KEY = '_user_snapshot'
+ALL_USERS = object()
+
+class SessionUser(UserMixin):
+    # What a request needs to know about the logged-in user. Loaded from the
+    # cache or the signed session cookie instead of the users table; views
+    # that need the full row should query it explicitly.
+    
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+    
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.role)
+    
+    def __repr__(self):
+        return f'<SessionUser {self.username}>'
+
+class UserCache:
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self._invalidated_all_at = 0.0
+    
+    def get(self, user_id):
+        return self.backend.get(('user', user_id))
+    
+    def put(self, user):
+        self.backend.set(('user', user.id), user, self.ttl)
+    
+    def invalidate(self, user_id):
+        self.backend.delete(('user', user_id))
+        # Remembered for one TTL: any snapshot issued before this is stale,
+        # and anything older than a TTL is rejected anyway.
+        self.backend.set(('invalidated', user_id), time.time(), self.ttl)
+    
+    def invalidate_all(self):
+        self._invalidated_all_at = time.time()
+        self.backend.clear()
+    
+    def snapshot_valid(self, user_id, issued_at):
+        now = time.time()
+        if issued_at + self.ttl <= now or issued_at < self._invalidated_all_at:
+            return False
+        invalidated_at = self.backend.get(('invalidated', user_id))
+        return invalidated_at is None or issued_at > invalidated_at
+
+def init_user_cache(app):
+    app.extensions['user_cache'] = UserCache(
+        MemoryCache(max_entries=app.config['USER_CACHE_MAX_ENTRIES']),
+        ttl=app.config['USER_CACHE_TTL']
+    )
+
+def get_user_cache():
+    return current_app.extensions['user_cache']
+
+def remember_session_user(user):
+    session[SESSION_KEY] = [user.id, user.username, user.role, time.time()]
+
+def forget_session_user():
+    session.pop(SESSION_KEY, None)
+
+def _user_from_session(user_id):
+    snapshot = session.get(SESSION_KEY)
+    if not snapshot or snapshot[0] != user_id:
+        return None
+    if not get_user_cache().snapshot_valid(user_id, snapshot[3]):
+        return None
+    return SessionUser(*snapshot[:3])
+
+def load_session_user(user_id):
+    # In-process cache first, then the snapshot in the signed session, and
+    # only when both are missing or older than USER_CACHE_TTL the database.
+    user_cache = get_user_cache()
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    user = _user_from_session(user_id)
+    if user is None:
+        row = db.session.get(User, user_id)
+        if row is None:
+            return None
+        user = SessionUser.from_user(row)
+        remember_session_user(user)
+    
+    user_cache.put(user)
+    return user
+
+def invalidate_users(user_ids):
+    if not (has_app_context() and 'user_cache' in current_app.extensions):
+        return
+    user_cache = get_user_cache()
+    if user_ids is ALL_USERS:
+        user_cache.invalidate_all()
+        return
+    for user_id in user_ids:
+        user_cache.invalidate(user_id)
+
+def _changed_users(session):
+    return {
+        obj.id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+
+@event.listens_for(Session, 'after_flush')
+def _collect_users_on_flush(session, flush_context):
+    user_ids = _changed_users(session)
+    if user_ids and session.info.get('users_dirty') is not ALL_USERS:
+        session.info.setdefault('users_dirty', set()).update(user_ids)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_users_on_statement(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, User):
+        orm_execute_state.session.info['users_dirty'] = ALL_USERS
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_users_on_commit(session):
+    user_ids = session.info.pop('users_dirty', None)
+    if user_ids:
+        invalidate_users(user_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_users_on_rollback(session):
+    session.info.pop('users_dirty', None)
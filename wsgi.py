@@ -0,0 +1,5 @@
+from app import create_app
+
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# (main.py runs the Werkzeug development server instead.)
+app = create_app()